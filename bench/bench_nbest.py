@@ -0,0 +1,75 @@
+# bench_nbest.py
+# Uso: python bench/bench_nbest.py <carpeta_wav> [alternativas]
+# La carpeta contiene WAV de 16 kHz mono y un labels.json {"archivo.wav": "intencion"}.
+# Compara la intención de la 1-best frente a la hipótesis reordenada por el
+# modelo de intenciones y mide la latencia que añade el reordenado.
+
+import os
+import sys
+import json
+import time
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(root_dir, "src"))
+
+from vosk import KaldiRecognizer
+from services import stt
+from services.audio_sources import WavFileSource
+from core import pln
+
+def decode(model, path, alternatives):
+    rec = KaldiRecognizer(model, 16000)
+    rec.SetMaxAlternatives(alternatives)
+    hypotheses = []
+    for frame in WavFileSource(path).frames():
+        if rec.AcceptWaveform(frame):
+            hypotheses = stt.parse_hypotheses(rec.Result()) or hypotheses
+    return stt.parse_hypotheses(rec.FinalResult()) or hypotheses
+
+def main():
+    if len(sys.argv) < 2:
+        print("Uso: python bench/bench_nbest.py <carpeta_wav> [alternativas]")
+        return
+    corpus = sys.argv[1]
+    alternatives = int(sys.argv[2]) if len(sys.argv) > 2 else stt.NBEST_ALTERNATIVES
+    with open(os.path.join(corpus, "labels.json"), encoding='utf-8') as f:
+        labels = json.load(f)
+
+    model = stt.ear_service.model
+    if model is None: return
+    pln.initialize_pln_model()
+
+    ok_1best = ok_rerank = changed = 0
+    baseline_ms, rerank_ms = [], []
+    for name, expected in sorted(labels.items()):
+        hypotheses = decode(model, os.path.join(corpus, name), alternatives)
+        if not hypotheses:
+            print(f"   {name}: sin texto")
+            continue
+
+        t0 = time.perf_counter()
+        best_1 = pln.process_command(hypotheses[0][0])
+        t1 = time.perf_counter()
+        text, reranked = pln.rerank_hypotheses(hypotheses)
+        t2 = time.perf_counter()
+        baseline_ms.append((t1 - t0) * 1000)
+        rerank_ms.append((t2 - t1) * 1000)
+
+        intent_1 = best_1[0]['comando'] if best_1 else None
+        intent_r = reranked[0]['comando'] if reranked else None
+        ok_1best += intent_1 == expected
+        ok_rerank += intent_r == expected
+        if text != hypotheses[0][0]:
+            changed += 1
+            print(f"   {name}: '{hypotheses[0][0]}' ({intent_1}) -> '{text}' ({intent_r}) [esperado {expected}]")
+
+    n = len(baseline_ms)
+    if not n: return
+    print(f"\nArchivos: {n}  alternativas: {alternatives}  reordenados: {changed}")
+    print(f"Precisión 1-best:      {ok_1best / n:.1%}")
+    print(f"Precisión reordenada:  {ok_rerank / n:.1%}")
+    print(f"PLN 1-best:   {sum(baseline_ms) / n:.3f} ms de media")
+    print(f"PLN N-best:   {sum(rerank_ms) / n:.3f} ms de media (+{(sum(rerank_ms) - sum(baseline_ms)) / n:.3f} ms)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+# bench_pdf_extraction.py
+# Uso: python bench/bench_pdf_extraction.py archivo.pdf [workers]
+# Compara el bucle serie original (text += t + " ") con iter_pdf_pages en paralelo.
+
+import os
+import sys
+import time
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(root_dir, "src"))
+
+from PyPDF2 import PdfReader
+from modules.os_control.pdf_extract import iter_pdf_pages, available_workers
+
+def legacy_loop(path):
+    reader = PdfReader(path)
+    text = ""
+    for page in reader.pages:
+        t = page.extract_text()
+        if t: text += t + " "
+    return len(reader.pages), text
+
+def parallel(path, workers):
+    pages = list(iter_pdf_pages(path, workers=workers, parallel=True))
+    return len(pages), " ".join(p for p in pages if p)
+
+def run(label, fn, *args):
+    start = time.perf_counter()
+    n_pages, text = fn(*args)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {n_pages:>6} págs  {elapsed:8.2f} s  {n_pages / elapsed:8.1f} págs/s")
+    return text
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__ or "Uso: bench_pdf_extraction.py archivo.pdf [workers]")
+        sys.exit(1)
+    path = sys.argv[1]
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else available_workers()
+
+    base = run("serie (bucle original)", legacy_loop, path)
+    par = run(f"paralelo ({workers} procesos)", parallel, path, workers)
+    print("Texto idéntico:", base.split() == par.split())
@@ -0,0 +1,53 @@
+# bench_pln_extraction.py
+# Uso: python bench/bench_pln_extraction.py [repeticiones]
+# Latencia de _extract_variables por intención: regex generado en cada llamada
+# (implementación original) frente al índice de patrones precompilado.
+
+import os
+import re
+import sys
+import time
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(root_dir, "src"))
+
+import json
+from core import pln
+
+def legacy_extract(text, intent_name):
+    config = pln.intent_config_cache.get(intent_name, {})
+    extracted = {}
+    for pattern in config.get("patterns", []):
+        match = re.search(pln._generate_regex_from_pattern(pattern), text, re.IGNORECASE)
+        if match:
+            for k, v in match.groupdict().items(): extracted[k] = v.strip()
+            for rule in config.get("rules", []):
+                extracted.setdefault(rule['entity_key'], None)
+            return extracted
+    return None
+
+def timed(fn, samples, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for text, intent in samples: fn(text, intent)
+    return (time.perf_counter() - start) / (repeats * len(samples)) * 1e6
+
+if __name__ == "__main__":
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    pln._load_data_config()
+    with open(pln.TRAINING_DATA_PATH, 'r', encoding='utf-8') as f:
+        intents = json.load(f)['intents']
+
+    print(f"{'intención':<26} {'ejemplos':>8} {'original µs':>12} {'compilado µs':>13} {'x':>6}")
+    mismatches = 0
+    for obj in intents:
+        name = obj['name']
+        if not pln.intent_config_cache[name]["patterns"]: continue
+        samples = [(ex, name) for ex in obj.get('examples', [])]
+        for text, intent in samples:
+            legacy = legacy_extract(text, intent)
+            if legacy is not None and legacy != pln._extract_variables(text, intent): mismatches += 1
+        old = timed(legacy_extract, samples, repeats)
+        new = timed(pln._extract_variables, samples, repeats)
+        print(f"{name:<26} {len(samples):>8} {old:>12.2f} {new:>13.2f} {old / new:>6.1f}")
+    print("Resultados distintos:", mismatches)
@@ -0,0 +1,68 @@
+# bench_registry.py
+# Uso: python bench/bench_registry.py
+# Tiempo de import y memoria residente de una sesión que solo pregunta la hora:
+# imports anticipados de todos los módulos (main.py original) frente al
+# registro perezoso. Cada escenario corre en un proceso nuevo.
+
+import os
+import sys
+import json
+import subprocess
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+src_dir = os.path.join(root_dir, "src")
+
+CHILD = r'''
+import os, sys, json, time
+sys.path.insert(0, {src!r})
+
+def rss_mb():
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 2**20
+    except ImportError:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"): return int(line.split()[1]) / 1024
+    return None
+
+base = rss_mb()
+t0 = time.perf_counter()
+if {mode!r} == "eager":
+    import modules.os_control.file_reader
+    import modules.office_auto.word_session
+    import modules.os_control.system_ops
+    import modules.web_navigator.web_search
+    import modules.web_navigator.teams_manager
+else:
+    from modules.registry import registry
+    registry.get("os_control")
+elapsed = time.perf_counter() - t0
+heavy = [m for m in ("selenium", "webdriver_manager", "docx", "PyPDF2", "comtypes", "bs4") if m in sys.modules]
+print(json.dumps({{"import_s": elapsed, "rss_mb": rss_mb(), "base_mb": base, "heavy": heavy}}))
+'''
+
+def run(mode):
+    out = subprocess.run([sys.executable, "-c", CHILD.format(src=src_dir, mode=mode)],
+                         capture_output=True, text=True, cwd=src_dir)
+    if out.returncode != 0:
+        print(f"   {mode}: error\n{out.stderr.strip()[-500:]}")
+        return None
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def main():
+    results = {mode: run(mode) for mode in ("eager", "lazy")}
+    for mode, r in results.items():
+        if not r: continue
+        rss = f"{r['rss_mb']:.1f} MB" if r['rss_mb'] else "?"
+        print(f"   {mode:<6} import {r['import_s'] * 1000:8.1f} ms   RSS {rss:>10}   pesados: {', '.join(r['heavy']) or '-'}")
+    eager, lazy = results.get("eager"), results.get("lazy")
+    if eager and lazy:
+        print(f"\nAhorro: {(eager['import_s'] - lazy['import_s']) * 1000:.0f} ms de import", end="")
+        if eager['rss_mb'] and lazy['rss_mb']:
+            print(f", {eager['rss_mb'] - lazy['rss_mb']:.1f} MB de RSS")
+        else:
+            print()
+
+if __name__ == "__main__":
+    main()
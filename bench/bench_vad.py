@@ -0,0 +1,71 @@
+# bench_vad.py
+# Uso: python bench/bench_vad.py <carpeta_o_wav> [modelo_vosk]
+# Reproduce grabaciones del modo reposo (16 kHz mono) y compara el CPU que gasta
+# Kaldi decodificando todas las tramas frente a solo las que deja pasar la puerta
+# de voz. Sin modelo, mide solo el coste de la VAD y la fracción reenviada.
+
+import os
+import sys
+import time
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(root_dir, "src"))
+
+from services.audio_sources import WavFileSource, SAMPLE_RATE, FRAME_SAMPLES
+from services.vad import EnergyVAD
+
+def wav_files(target):
+    if os.path.isdir(target):
+        return sorted(os.path.join(target, n) for n in os.listdir(target) if n.lower().endswith(".wav"))
+    return [target]
+
+def decode_cpu(model, frames):
+    from vosk import KaldiRecognizer
+    rec = KaldiRecognizer(model, SAMPLE_RATE)
+    t0 = time.process_time()
+    for frame in frames:
+        rec.AcceptWaveform(frame)
+    rec.FinalResult()
+    return time.process_time() - t0
+
+def main():
+    if len(sys.argv) < 2:
+        print("Uso: python bench/bench_vad.py <carpeta_o_wav> [modelo_vosk]")
+        return
+    files = wav_files(sys.argv[1])
+    model = None
+    if len(sys.argv) > 2:
+        from vosk import Model, SetLogLevel
+        SetLogLevel(-1)
+        model = Model(sys.argv[2])
+
+    total_frames = total_forwarded = 0
+    vad_cpu = cpu_all = cpu_gated = 0.0
+    for path in files:
+        frames = list(WavFileSource(path).frames())
+        vad = EnergyVAD()
+        t0 = time.process_time()
+        gated = [f for frame in frames for f in vad.process(frame)]
+        vad_cpu += time.process_time() - t0
+        total_frames += len(frames)
+        total_forwarded += len(gated)
+        line = f"   {os.path.basename(path)}: {len(gated)}/{len(frames)} tramas a Kaldi ({vad.forwarded_ratio:.1%})"
+        if model:
+            full, part = decode_cpu(model, frames), decode_cpu(model, gated)
+            cpu_all += full
+            cpu_gated += part
+            line += f"  CPU {full:.2f}s -> {part:.2f}s"
+        print(line)
+
+    if not total_frames: return
+    audio_s = total_frames * FRAME_SAMPLES / SAMPLE_RATE
+    print(f"\nAudio: {audio_s:.1f}s  tramas reenviadas: {total_forwarded / total_frames:.1%}")
+    print(f"Coste VAD: {vad_cpu / total_frames * 1e6:.1f} us/trama ({vad_cpu / audio_s:.2%} de un núcleo)")
+    if model:
+        with_vad = cpu_gated + vad_cpu
+        print(f"CPU Kaldi sin VAD: {cpu_all / audio_s:.2%} de un núcleo")
+        print(f"CPU Kaldi con VAD: {with_vad / audio_s:.2%} de un núcleo")
+        print(f"Ahorro en reposo: {1 - with_vad / cpu_all:.1%}" if cpu_all else "")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# config.py
+
+import os
+
+USER_HOME = os.path.expanduser("~")
+
+# Carpeta de datos de usuario (posiciones de lectura, índices, cachés)
+LESI_HOME = os.environ.get("LESI_HOME", os.path.join(USER_HOME, ".lesi"))
+
+# Carpetas que indexa el lector de archivos (nombre hablado -> ruta)
+FILE_INDEX_ROOTS = {
+    "descargas": os.path.join(USER_HOME, "Downloads"),
+    "escritorio": os.path.join(USER_HOME, "Desktop"),
+    "documentos": os.path.join(USER_HOME, "Documents"),
+}
+FILE_INDEX_MAX_DEPTH = 3
+# Segundos entre re-escaneos en segundo plano; una búsqueda sin resultado
+# re-escanea al momento. LESI_FILE_INDEX_REFRESH_S=0 desactiva el hilo.
+FILE_INDEX_REFRESH_S = float(os.environ.get("LESI_FILE_INDEX_REFRESH_S", "600"))
+
+# Extracción de PDF en paralelo (procesos), opcional: LESI_PDF_PARALLEL=1 la
+# activa. bench/bench_pdf_extraction.py la compara con la extracción en serie.
+PDF_PARALLEL = os.environ.get("LESI_PDF_PARALLEL", "0") == "1"
+
+# Puerta de voz (VAD) delante del reconocedor en modo reposo; LESI_VAD=0 la desactiva
+VAD_ENABLED = os.environ.get("LESI_VAD", "1") != "0"
+
+# Variantes de la palabra de activación tal como las transcribe Vosk.
+# LESI_WAKE_TRIGGERS="lesi,lessie,..." las sustituye.
+WAKE_TRIGGERS = [t.strip() for t in os.environ.get("LESI_WAKE_TRIGGERS", "").split(",") if t.strip()] or [
+    "lesi", "le si", "lazy", "lessie", "leci", "lissy", "lessy",
+    "le sí", "les y", "decí", "deci", "desir",
+]
+# Confianza media por palabra exigida al disparador
+WAKE_MIN_CONFIDENCE = float(os.environ.get("LESI_WAKE_MIN_CONF", "0.6"))
+# Reposo con gramática restringida a los disparadores + [unk] (mucho más barato que el decodificador completo)
+WAKE_USE_GRAMMAR = os.environ.get("LESI_WAKE_GRAMMAR", "1") != "0"
+
+# Fin de enunciado: silencio final y estabilidad del parcial (ms) para cerrar sin esperar a Kaldi
+ENDPOINT_SILENCE_MS = int(os.environ.get("LESI_ENDPOINT_SILENCE_MS", "600"))
+ENDPOINT_STABLE_MS = int(os.environ.get("LESI_ENDPOINT_STABLE_MS", "400"))
+# Segundos de silencio antes de volver a reposo: turno normal y turno tras "Dime."
+LISTEN_TIMEOUT = 100
+LISTEN_FOLLOWUP_TIMEOUT = 8
+
+# Módulos que se importan en segundo plano al arrancar; el resto, al primer uso.
+# LESI_WARM_MODULES="os_control,file_reader,web_search"
+WARM_MODULES = tuple(m.strip() for m in os.environ.get("LESI_WARM_MODULES", "os_control,file_reader").split(",") if m.strip())
+
+# Presupuesto de memoria (MB) para el informe de diagnóstico; 0 = sin límite
+MEMORY_BUDGET_MB = float(os.environ.get("LESI_MEMORY_BUDGET_MB", "0"))
+
+# Módulos que corren en un proceso aparte: un chromedriver colgado o un
+# fallo de COM no congela ni tumba el bucle de voz. LESI_WORKER_MODULES="" los
+# devuelve al proceso principal.
+WORKER_MODULES = tuple(m.strip() for m in os.environ.get("LESI_WORKER_MODULES", "web_search,teams_manager").split(",") if m.strip())
+
+# Tiempo máximo (s) por intención en un trabajador; no cuenta lo que tarda en
+# decirse lo que el módulo pide hablar. Pasado el límite, se reinicia el proceso.
+WORKER_TIMEOUT_DEFAULT = 60
+WORKER_TIMEOUTS = {
+    "investigar_web": 45,
+    "seleccionar_web": 60,
+    "abrir_teams": 120,
+    "entrar_equipo": 90,
+    "descargar_archivo_teams": 180,
+    "subir_archivo_teams": 180,
+    "dictado": 120,
+    "prewarm": 90,
+    "convert_to_pdf": 90,
+}
@@ -0,0 +1,97 @@
+# compact_model.py
+
+import re
+import numpy as np
+from typing import Dict, List, Optional
+
+# Mismo token_pattern que TfidfVectorizer por defecto
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+
+class CompactIntentModel:
+    """
+    Predictor de intenciones sin sklearn: reproduce TfidfVectorizer
+    (palabras, n-gramas 1-2, idf suavizado, norma L2) + LogisticRegression
+    liblinear (uno contra el resto) a partir de arrays NumPy.
+    """
+    def __init__(self, terms, idf, coef, intercept, classes, ngram_range=(1, 2), stamp: str = ""):
+        self.vocabulary: Dict[str, int] = {t: i for i, t in enumerate(terms.tolist())}
+        self.idf = idf
+        self.coef = coef
+        self.intercept = intercept
+        self.classes_ = classes
+        self.ngram_range = (int(ngram_range[0]), int(ngram_range[1]))
+        self.stamp = stamp
+
+    # --- Exportación / carga ---
+    @staticmethod
+    def export(pipeline, path: str, stamp: str = ""):
+        vectorizer = pipeline.named_steps['tfidf']
+        clf = pipeline.named_steps['clf']
+        terms = [None] * len(vectorizer.vocabulary_)
+        for term, idx in vectorizer.vocabulary_.items():
+            terms[idx] = term
+        np.savez(
+            path,
+            terms=np.array(terms),
+            idf=vectorizer.idf_.astype(np.float64),
+            coef=clf.coef_.astype(np.float64),
+            intercept=clf.intercept_.astype(np.float64),
+            classes=np.array([str(c) for c in clf.classes_]),
+            ngram_range=np.array(vectorizer.ngram_range),
+            stamp=np.array(stamp),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "CompactIntentModel":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data['terms'], data['idf'], data['coef'], data['intercept'],
+                       data['classes'], data['ngram_range'], str(data['stamp']))
+
+    @staticmethod
+    def read_stamp(path: str) -> Optional[str]:
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                return str(data['stamp'])
+        except Exception:
+            return None
+
+    # --- Predicción ---
+    def _analyze(self, doc: str) -> List[str]:
+        tokens = TOKEN_PATTERN.findall(doc.lower())
+        min_n, max_n = self.ngram_range
+        grams = list(tokens) if min_n == 1 else []
+        for n in range(max(2, min_n), max_n + 1):
+            grams.extend(" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+        return grams
+
+    def _vectorize(self, doc: str):
+        counts: Dict[int, int] = {}
+        for gram in self._analyze(doc):
+            idx = self.vocabulary.get(gram)
+            if idx is not None: counts[idx] = counts.get(idx, 0) + 1
+        if not counts: return np.empty(0, dtype=np.intp), np.empty(0)
+        idxs = np.fromiter(counts.keys(), dtype=np.intp, count=len(counts))
+        vals = np.fromiter(counts.values(), dtype=np.float64, count=len(counts)) * self.idf[idxs]
+        norm = np.sqrt(np.dot(vals, vals))
+        if norm > 0: vals /= norm
+        return idxs, vals
+
+    def decision_function(self, docs: List[str]) -> np.ndarray:
+        scores = np.empty((len(docs), self.coef.shape[0]))
+        for row, doc in enumerate(docs):
+            idxs, vals = self._vectorize(doc)
+            scores[row] = self.coef[:, idxs] @ vals + self.intercept
+        return scores
+
+    def predict_proba(self, docs: List[str]) -> np.ndarray:
+        scores = self.decision_function(docs)
+        prob = 1.0 / (1.0 + np.exp(-scores))
+        if self.coef.shape[0] == 1:
+            return np.hstack([1.0 - prob, prob])
+        return prob / prob.sum(axis=1, keepdims=True)
+
+    def predict(self, docs: List[str]) -> np.ndarray:
+        scores = self.decision_function(docs)
+        if self.coef.shape[0] == 1:
+            return self.classes_[(scores[:, 0] > 0).astype(int)]
+        return self.classes_[scores.argmax(axis=1)]
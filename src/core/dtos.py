@@ -1,21 +1,29 @@
 import json
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 
 class CommandDTO:
-    def __init__(self, comando: str, variables: Dict[str, Any], modulo: str = "unknown"):
+    def __init__(self, comando: str, variables: Dict[str, Any], modulo: str = "unknown",
+                 confianza: float = 1.0, alternativas: Optional[List[Dict[str, Any]]] = None,
+                 confirmar: bool = False):
         self.comando = comando
         self.variables = variables
         self.modulo = modulo
+        self.confianza = confianza
+        self.alternativas = alternativas or []
+        self.confirmar = confirmar
 
     def to_dict(self) -> Dict[str, Any]:
         return {
             "comando": self.comando,
             "variables": self.variables,
-            "modulo": self.modulo
+            "modulo": self.modulo,
+            "confianza": self.confianza,
+            "alternativas": self.alternativas,
+            "confirmar": self.confirmar
         }
     
     def to_json(self) -> str:
         return json.dumps(self.to_dict(), ensure_ascii=False)
 
     def __repr__(self):
-        return self.to_json()
\ No newline at end of file
+        return self.to_json()
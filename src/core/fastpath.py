@@ -0,0 +1,98 @@
+# fastpath.py
+
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+HIT = "hit"
+AMBIGUOUS = "ambiguous"
+MISS = "miss"
+
+# Con una sola palabra literal ("subir {file_name}", "ir a {team_name}") el
+# patrón casa casi cualquier cosa: se deja al clasificador, salvo que todas sus
+# variables sean de un tipo comprobable ("nivel {level}" con level numérico).
+# Artículos y preposiciones no cuentan como palabra literal.
+MIN_LITERAL_TOKENS = 2
+_FUNCTION_WORDS = {"a", "al", "de", "del", "el", "en", "la", "las", "lo", "los", "un", "una", "y", "o"}
+
+_NUMBER_WORDS = (r"cero|uno?|una|dos|tres|cuatro|cinco|seis|siete|ocho|nueve|diez|once|doce|trece|catorce|quince"
+                 r"|dieci\w+|veinte|veinti\w+|treinta|cuarenta|cincuenta|sesenta|setenta|ochenta|noventa|cien|ciento")
+# Valores aceptados por tipo de regla (extraction_rules[].type)
+SLOT_TYPES = {
+    "number": re.compile(rf"\d{{1,3}}|(?:{_NUMBER_WORDS})(?:\s+y\s+(?:{_NUMBER_WORDS}))?", re.IGNORECASE),
+}
+
+class PatternFastPath:
+    """
+    Trie de tokens sobre la parte literal inicial de los patrones de
+    training_data.json. Un segmento que coincide por completo con patrones de
+    una sola intención se resuelve sin pasar por el clasificador. Los ejemplos
+    de entrenamiento literales se consultan antes que los patrones, para que
+    "leer hora" no caiga en "leer {file_name}".
+    """
+    def __init__(self, config_cache: Dict[str, Dict]):
+        self._root: Dict[str, Any] = {}
+        self._unanchored: List[Tuple[int, str, Any, List[str], Dict[str, Any]]] = []
+        self._examples: Dict[str, Optional[str]] = {}
+        for intent, cfg in config_cache.items():
+            for text in cfg.get("examples", []):
+                key = " ".join(text.lower().split())
+                # Un mismo ejemplo en dos intenciones no sirve para decidir
+                self._examples[key] = intent if self._examples.get(key, intent) == intent else None
+        for intent, cfg in config_cache.items():
+            rules = cfg.get("rules", [])
+            keys = [rule['entity_key'] for rule in rules]
+            slot_types = {rule['entity_key']: SLOT_TYPES[rule['type']] for rule in rules if rule.get('type') in SLOT_TYPES}
+            for pattern, (regex, _) in zip(cfg.get("patterns", []), cfg.get("compiled", [])):
+                literals = [t for t in pattern.lower().split() if "{" not in t and t not in _FUNCTION_WORDS]
+                slots = re.findall(r"\{(\w+)\}", pattern)
+                checks = {}
+                if len(literals) < MIN_LITERAL_TOKENS:
+                    if not slots or not all(slot in slot_types for slot in slots): continue
+                    checks = {slot: slot_types[slot] for slot in slots}
+                entry = (len(pattern), intent, regex, keys, checks)
+                prefix = []
+                for token in pattern.lower().split():
+                    if "{" in token: break
+                    prefix.append(token)
+                if not prefix:
+                    self._unanchored.append(entry)
+                    continue
+                node = self._root
+                for token in prefix:
+                    node = node.setdefault(token, {})
+                node.setdefault("$", []).append(entry)
+
+    def _candidates(self, tokens):
+        found = list(self._unanchored)
+        node = self._root
+        for token in tokens:
+            node = node.get(token)
+            if node is None: break
+            found.extend(node.get("$", ()))
+        # Igual que la extracción: patrones más largos primero
+        found.sort(key=lambda e: e[0], reverse=True)
+        return found
+
+    def match(self, segment: str) -> Tuple[str, Optional[str], Optional[Dict[str, Any]]]:
+        text = segment.strip()
+        key = " ".join(text.lower().split())
+        if key in self._examples:
+            intent = self._examples[key]
+            if intent is None: return AMBIGUOUS, None, None
+            # Las variables las extrae pln con las reglas habituales
+            return HIT, intent, None
+
+        matches: Dict[str, Dict[str, Any]] = {}
+        for _, intent, regex, keys, checks in self._candidates(text.lower().split()):
+            if intent in matches: continue
+            m = regex.fullmatch(text)
+            if not m: continue
+            variables = {k: v.strip() for k, v in m.groupdict().items()}
+            if not all(check.fullmatch(variables.get(slot, "")) for slot, check in checks.items()): continue
+            for key in keys: variables.setdefault(key, None)
+            matches[intent] = variables
+
+        if len(matches) == 1:
+            intent, variables = next(iter(matches.items()))
+            return HIT, intent, variables
+        return (AMBIGUOUS if matches else MISS), None, None
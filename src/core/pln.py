@@ -4,12 +4,11 @@ import os
 import sys
 import json
 import re
-import joblib
-import spacy
-from typing import List, Dict, Any, Optional
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
-from sklearn.pipeline import Pipeline
+import math
+import time
+import hashlib
+import threading
+from typing import List, Dict, Any, Optional, Tuple
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 root_dir = os.path.dirname(os.path.dirname(current_dir))
@@ -17,9 +16,21 @@ if root_dir not in sys.path: sys.path.append(root_dir)
 
 try:
     from src.core.dtos import CommandDTO
+    from src.core.compact_model import CompactIntentModel
+    from src.core.fastpath import PatternFastPath, HIT as FASTPATH_HIT, AMBIGUOUS, MISS
 except ImportError:
     sys.path.append(os.path.join(current_dir, '..', '..'))
     from src.core.dtos import CommandDTO
+    from src.core.compact_model import CompactIntentModel
+    from src.core.fastpath import PatternFastPath, HIT as FASTPATH_HIT, AMBIGUOUS, MISS
+
+try:
+    from services.diagnostics import memory_report
+    _track_memory = memory_report.track
+except ImportError:
+    # Sin src en sys.path (scripts sueltos): no se atribuye memoria
+    from contextlib import nullcontext
+    _track_memory = lambda name: nullcontext()
 
 def get_base_path():
     if getattr(sys, 'frozen', False):
@@ -33,35 +44,79 @@ else:
     DATA_DIR = os.path.join(BASE_DIR, "data")
 
 MODEL_PATH = os.path.join(DATA_DIR, 'intent_classifier.pkl')
+COMPACT_MODEL_PATH = os.path.join(DATA_DIR, 'intent_model.npz')
 TRAINING_DATA_PATH = os.path.join(DATA_DIR, 'training_data.json')
 
-nlp: Optional[spacy.Language] = None
-intent_classifier: Optional[Pipeline] = None
+# spaCy no interviene en la clasificación: se carga solo si alguien llama a get_spacy()
+nlp: Optional[Any] = None
+_spacy_lock = threading.Lock()
+intent_classifier: Optional[CompactIntentModel] = None
 intent_config_cache: Dict[str, Dict] = {}
+pln_settings: Dict[str, Any] = {"default_threshold": 0.0, "top_k": 3}
 
-def _load_data_config():
-    global intent_config_cache
-    texts, labels = [], []
-    intent_config_cache = {}
+# Hiperparámetros del entrenamiento; forman parte del sello del modelo
+HYPERPARAMS = {"ngram_range": [1, 2], "solver": "liblinear", "format": 1}
+
+# (clasificador, configuración, ajustes, vía rápida) se publican juntos y se leen de una vez
+_active_model = (None, {}, dict(pln_settings), None)
+_fastpath_stats = {FASTPATH_HIT: 0, AMBIGUOUS: 0, MISS: 0}
+_stats_lock = threading.Lock()
+_swap_lock = threading.Lock()
+_watcher: Optional[threading.Thread] = None
+_watcher_stop = threading.Event()
 
-    if not os.path.exists(TRAINING_DATA_PATH): return [], []
+def _training_stamp() -> str:
+    """Hash del contenido de training_data.json + hiperparámetros (independiente del mtime)."""
+    h = hashlib.sha256()
+    with open(TRAINING_DATA_PATH, 'rb') as f:
+        h.update(f.read())
+    h.update(json.dumps(HYPERPARAMS, sort_keys=True).encode('utf-8'))
+    return h.hexdigest()
+
+def _build_data_config():
+    texts, labels, config = [], [], {}
+    settings = {"default_threshold": 0.0, "top_k": 3, "fast_path": True, "prewarm_threshold": 0.3, "nbest_asr_weight": 0.5}
+
+    if not os.path.exists(TRAINING_DATA_PATH): return texts, labels, config, settings
 
     with open(TRAINING_DATA_PATH, 'r', encoding='utf-8') as f:
         data = json.load(f)
 
+    settings.update(data.get('settings', {}))
+    default_threshold = settings.get('default_threshold', 0.0)
+
     for obj in data['intents']:
         name = obj['name']
         patterns = obj.get('patterns', [])
         patterns.sort(key=len, reverse=True)
         
-        intent_config_cache[name] = {
+        config[name] = {
             "patterns": patterns,
+            "compiled": [_compile_pattern(p) for p in patterns],
             "rules": obj.get('extraction_rules', []),
-            "module": obj.get('module', 'unknown') 
+            "examples": obj.get('examples', []),
+            "module": obj.get('module', 'unknown'),
+            "threshold": obj.get('threshold', default_threshold),
+            "confirm_threshold": obj.get('confirm_threshold', 0.0)
         }
         for ex in obj.get('examples', []):
             texts.append(ex)
             labels.append(name)
+    return texts, labels, config, settings
+
+def _publish(classifier, config, settings):
+    """Intercambio atómico del modelo activo (el bucle de escucha nunca se pausa)."""
+    global _active_model, intent_classifier, intent_config_cache, pln_settings
+    fast_path = PatternFastPath(config) if settings.get("fast_path", True) else None
+    with _swap_lock:
+        _active_model = (classifier, config, settings, fast_path)
+        intent_classifier = classifier
+        intent_config_cache = config
+        pln_settings = settings
+
+def _load_data_config():
+    texts, labels, config, settings = _build_data_config()
+    _publish(intent_classifier, config, settings)
     return texts, labels
 
 def _generate_regex_from_pattern(pattern: str) -> str:
@@ -72,15 +127,27 @@ def _generate_regex_from_pattern(pattern: str) -> str:
     regex = re.sub(r'\\\{(\w+)\\\}', r'(?P<\1>.+?)', regex)
     return regex
 
-def _extract_variables(text: str, intent_name: str) -> Dict[str, Any]:
-    config = intent_config_cache.get(intent_name, {})
-    patterns = config.get("patterns", [])
+def _pattern_keywords(pattern: str) -> tuple:
+    # Partes literales del patrón: si alguna falta en el texto, el regex no puede coincidir
+    literal = re.sub(r'\{\w+\}', ' ', pattern).lower()
+    return tuple(sorted(set(literal.split()), key=len, reverse=True))
+
+def _compile_pattern(pattern: str):
+    return re.compile(_generate_regex_from_pattern(pattern), re.IGNORECASE), _pattern_keywords(pattern)
+
+_NUMBER_RE = re.compile(r'\b(\d{1,3})\b')
+_FILE_RE = re.compile(r'\b([\w\-\(\)\[\] ]+\.(pdf|docx|txt))\b', re.IGNORECASE)
+
+def _extract_variables(text: str, intent_name: str, config_cache: Optional[Dict[str, Dict]] = None) -> Dict[str, Any]:
+    config = (intent_config_cache if config_cache is None else config_cache).get(intent_name, {})
+    compiled = config.get("compiled", [])
     rules = config.get("rules", [])
     extracted_data = {}
+    text_lower = text.lower()
 
-    for pattern in patterns:
-        regex_str = _generate_regex_from_pattern(pattern)
-        match = re.search(regex_str, text, re.IGNORECASE)
+    for regex, keywords in compiled:
+        if not all(k in text_lower for k in keywords): continue
+        match = regex.search(text)
         if match:
             raw_data = match.groupdict()
             for k, v in raw_data.items():
@@ -94,72 +161,326 @@ def _extract_variables(text: str, intent_name: str) -> Dict[str, Any]:
         key = rule['entity_key']
         dtype = rule['type']
         if dtype == "number":
-            nums = re.findall(r'\b(\d{1,3})\b', text)
+            nums = _NUMBER_RE.findall(text)
             extracted_data[key] = nums[-1] if nums else None
         elif dtype == "text":
             if "file" in key or "document" in key:
-                 match_ext = re.search(r'\b([\w\-\(\)\[\] ]+\.(pdf|docx|txt))\b', text, re.IGNORECASE)
+                 match_ext = _FILE_RE.search(text)
                  extracted_data[key] = match_ext.group(1).strip() if match_ext else None
             else:
                 extracted_data[key] = None
     return extracted_data
 
-def train_model():
-    print(">>> [PLN] Entrenando...")
-    texts, labels = _load_data_config()
-    if not texts: return
+def _fit_and_export(texts, labels, stamp: str) -> CompactIntentModel:
+    # sklearn/joblib solo se necesitan para entrenar; en ejecución basta NumPy
+    import joblib
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import Pipeline
+
     pipeline = Pipeline([
-        ('tfidf', TfidfVectorizer(ngram_range=(1, 2))),
-        ('clf', LogisticRegression(solver='liblinear', multi_class='auto'))
+        ('tfidf', TfidfVectorizer(ngram_range=tuple(HYPERPARAMS["ngram_range"]))),
+        ('clf', LogisticRegression(solver=HYPERPARAMS["solver"]))
     ])
     pipeline.fit(texts, labels)
     if not os.path.exists(DATA_DIR): os.makedirs(DATA_DIR)
-    joblib.dump(pipeline, MODEL_PATH)
+
+    # Se escribe a temporales y se reemplaza: nunca queda un artefacto a medias
+    tmp_pkl = MODEL_PATH + ".tmp"
+    tmp_npz = COMPACT_MODEL_PATH + ".tmp.npz"
+    joblib.dump(pipeline, tmp_pkl)
+    CompactIntentModel.export(pipeline, tmp_npz, stamp)
+    os.replace(tmp_pkl, MODEL_PATH)
+    os.replace(tmp_npz, COMPACT_MODEL_PATH)
+    return CompactIntentModel.load(COMPACT_MODEL_PATH)
+
+def train_model():
+    print(">>> [PLN] Entrenando...")
+    texts, labels = _load_data_config()
+    if not texts: return
+    classifier = _fit_and_export(texts, labels, _training_stamp())
+    _publish(classifier, intent_config_cache, pln_settings)
     print(">>> [PLN] Guardado.")
 
+def _model_is_fresh() -> bool:
+    if not os.path.exists(COMPACT_MODEL_PATH): return False
+    if not os.path.exists(TRAINING_DATA_PATH): return True
+    return CompactIntentModel.read_stamp(COMPACT_MODEL_PATH) == _training_stamp()
+
+def get_spacy():
+    """Carga diferida de spaCy (es_core_web_sm, o un modelo vacío si no está instalado)."""
+    global nlp
+    if nlp is not None: return nlp
+    with _spacy_lock:
+        if nlp is None:
+            with _track_memory("spacy"):
+                import spacy
+                try: nlp = spacy.load("es_core_web_sm")
+                except: nlp = spacy.blank("es")
+    return nlp
+
 def initialize_pln_model():
-    global nlp, intent_classifier
-    if nlp and intent_classifier: return True
-    try: nlp = spacy.load("es_core_web_sm")
-    except: nlp = spacy.blank("es")
-    
-    needs_training = False
-    if not os.path.exists(MODEL_PATH):
-        needs_training = True
-    elif os.path.exists(TRAINING_DATA_PATH):
-        if os.path.getmtime(TRAINING_DATA_PATH) > os.path.getmtime(MODEL_PATH):
-            needs_training = True
-
-    if needs_training:
-        train_model()
-    else:
-        _load_data_config()
+    if intent_classifier: return True
 
-    if os.path.exists(MODEL_PATH):
-        intent_classifier = joblib.load(MODEL_PATH)
+    with _track_memory("modelo_intenciones"):
+        if not _model_is_fresh():
+            train_model()
+        else:
+            _load_data_config()
+            _publish(CompactIntentModel.load(COMPACT_MODEL_PATH), intent_config_cache, pln_settings)
     return True
 
-def process_command(raw_text: str) -> List[Dict]:
-    global intent_classifier
-    if not intent_classifier: initialize_pln_model()
-    response_list = []
-    segments = re.split(r'\b(y|e|además|luego|después)\b', raw_text, flags=re.IGNORECASE)
-    clean_segments = [s.strip() for s in segments if len(s.strip()) > 2 and s.lower() not in ['y','e','además','luego','después']]
-    if not clean_segments: clean_segments = [raw_text]
-
-    for segment in clean_segments:
+def reload_if_changed() -> bool:
+    """Reentrena fuera del bucle principal si cambió training_data.json y publica el nuevo modelo."""
+    stamp = _training_stamp()
+    current = _active_model[0]
+    if current is not None and getattr(current, "stamp", None) == stamp: return False
+
+    print(">>> [PLN] Datos de entrenamiento modificados. Reentrenando en segundo plano...")
+    texts, labels, config, settings = _build_data_config()
+    if not texts: return False
+    classifier = _fit_and_export(texts, labels, stamp)
+    _publish(classifier, config, settings)
+    print(">>> [PLN] Modelo actualizado en caliente.")
+    return True
+
+def _file_signature():
+    st = os.stat(TRAINING_DATA_PATH)
+    return st.st_mtime_ns, st.st_size
+
+def _watch_training_data(interval: float):
+    try: last_seen = _file_signature()
+    except OSError: last_seen = None
+    while not _watcher_stop.wait(interval):
         try:
-            pred_intent = intent_classifier.predict([segment])[0]
-            variables = _extract_variables(segment, pred_intent)
-            
-            intent_info = intent_config_cache.get(pred_intent, {})
-            module_name = intent_info.get("module", "unknown")
-            
-            dto = CommandDTO(pred_intent, variables, module_name)
-            response_list.append(dto.to_dict())
+            signature = _file_signature()
+            if signature == last_seen: continue
+            # El mtime solo decide cuándo mirar; el hash decide si hay que reentrenar
+            reload_if_changed()
+            last_seen = signature
         except Exception as e:
-            response_list.append(CommandDTO("error", {"detalle": str(e)}, "error").to_dict())
-    return response_list
+            print(f">>> [PLN] Error en recarga en caliente: {e}")
+
+def start_model_watcher(interval: float = 5.0):
+    global _watcher
+    if _watcher and _watcher.is_alive(): return
+    _watcher_stop.clear()
+    _watcher = threading.Thread(target=_watch_training_data, args=(interval,), name="LesiPLNWatcher", daemon=True)
+    _watcher.start()
+
+def stop_model_watcher():
+    _watcher_stop.set()
+
+_SEGMENT_SPLIT = re.compile(r'\b(y|e|además|luego|después)\b', re.IGNORECASE)
+_CONNECTORS = {'y', 'e', 'además', 'luego', 'después'}
+
+def _segment(raw_text: str) -> List[str]:
+    segments = _SEGMENT_SPLIT.split(raw_text)
+    clean_segments = [s.strip() for s in segments if len(s.strip()) > 2 and s.lower() not in _CONNECTORS]
+    return clean_segments or [raw_text]
+
+def _classified_dto(segment, row, ranking, classes, config_cache) -> Dict:
+    try:
+        pred_intent = str(classes[ranking[0]])
+        confidence = round(float(row[ranking[0]]), 4)
+        alternatives = [{"comando": str(classes[j]), "confianza": round(float(row[j]), 4)} for j in ranking[1:]]
+        intent_info = config_cache.get(pred_intent, {})
+
+        # Rechazo rápido: por debajo del umbral no se lanza ningún módulo
+        if confidence < intent_info.get("threshold", 0.0):
+            alternatives.insert(0, {"comando": pred_intent, "confianza": confidence})
+            return CommandDTO("no_entendido", {}, "unknown", confidence, alternatives).to_dict()
+
+        variables = _extract_variables(segment, pred_intent, config_cache)
+        module_name = intent_info.get("module", "unknown")
+        needs_confirmation = confidence < intent_info.get("confirm_threshold", 0.0)
+
+        return CommandDTO(pred_intent, variables, module_name, confidence, alternatives, needs_confirmation).to_dict()
+    except Exception as e:
+        return CommandDTO("error", {"detalle": str(e)}, "error").to_dict()
+
+def _classify_segments(segments: List[str], model=None, statuses: Optional[List] = None) -> List[Dict]:
+    """
+    Un DTO por segmento: lo que la vía rápida resuelve sin ambigüedad no pasa
+    por el clasificador; el resto va en un solo predict_proba. Si se pasa
+    statuses, se añade el resultado de la vía rápida de cada segmento (None
+    si está desactivada) para que quien llama lo contabilice.
+    """
+    classifier, config_cache, settings, fast_path = model or _active_model
+    results: List[Optional[Dict]] = [None] * len(segments)
+    pending = []
+    for idx, segment in enumerate(segments):
+        status = None
+        if fast_path is not None:
+            status, intent, variables = fast_path.match(segment)
+            if status == FASTPATH_HIT:
+                if variables is None: variables = _extract_variables(segment, intent, config_cache)
+                module_name = config_cache.get(intent, {}).get("module", "unknown")
+                results[idx] = CommandDTO(intent, variables, module_name).to_dict()
+        if statuses is not None: statuses.append(status)
+        if results[idx] is None: pending.append(idx)
+
+    if pending:
+        try:
+            probas = classifier.predict_proba([segments[i] for i in pending])
+            classes = classifier.classes_
+            top_k = max(1, int(settings.get('top_k', 3)))
+            rankings = probas.argsort(axis=1)[:, ::-1][:, :top_k]
+            for idx, row, ranking in zip(pending, probas, rankings):
+                results[idx] = _classified_dto(segments[idx], row, ranking, classes, config_cache)
+        except Exception as e:
+            for idx in pending:
+                results[idx] = CommandDTO("error", {"detalle": str(e)}, "error").to_dict()
+    return results
+
+def _count_fastpath(statuses):
+    # Solo clasificaciones finales: los parciales de IncrementalNLU no cuentan
+    with _stats_lock:
+        for status in statuses:
+            if status is not None: _fastpath_stats[status] += 1
+
+def process_commands(raw_texts: List[str]) -> List[List[Dict]]:
+    """
+    Versión por lotes: segmenta todas las frases, resuelve por la vía rápida
+    los segmentos que coinciden sin ambigüedad con un ejemplo o un patrón y
+    clasifica el resto con una sola llamada a predict_proba.
+    """
+    if not _active_model[0]: initialize_pln_model()
+    owners, segments = [], []
+    for i, raw_text in enumerate(raw_texts):
+        for segment in _segment(raw_text):
+            owners.append(i)
+            segments.append(segment)
+
+    response_lists: List[List[Dict]] = [[] for _ in raw_texts]
+    if not segments: return response_lists
+
+    statuses: List = []
+    for owner, dto in zip(owners, _classify_segments(segments, statuses=statuses)):
+        response_lists[owner].append(dto)
+    _count_fastpath(statuses)
+    return response_lists
+
+def _nlu_score(dtos: List[Dict]) -> float:
+    # Segmentos rechazados o con error cuentan como cero
+    scores = [0.0 if d["modulo"] in ("unknown", "error") else d.get("confianza", 0.0) for d in dtos]
+    return sum(scores) / len(scores) if scores else 0.0
+
+def rerank_hypotheses(hypotheses: List[Tuple[str, float]], classify=None, asr_weight: Optional[float] = None) -> Tuple[str, List[Dict]]:
+    """
+    Elige entre las N mejores hipótesis del reconocedor. Todas se clasifican
+    en un solo lote y gana la de mejor puntuación conjunta
+    asr_weight * log(p_asr) + (1 - asr_weight) * log(p_nlu).
+    Devuelve (texto elegido, DTOs de ese texto).
+    """
+    if not _active_model[0]: initialize_pln_model()
+    hypotheses = [(text, prob) for text, prob in hypotheses if text and text.strip()]
+    if not hypotheses: return "", []
+    if asr_weight is None: asr_weight = _active_model[2].get("nbest_asr_weight", 0.5)
+
+    per_hyp = [_segment(text) for text, _ in hypotheses]
+    unique = list(dict.fromkeys(seg for segments in per_hyp for seg in segments))
+    status_of = None
+    if classify: dtos = classify(unique)
+    else:
+        statuses: List = []
+        dtos = dict(zip(unique, _classify_segments(unique, statuses=statuses)))
+        status_of = dict(zip(unique, statuses))
+
+    best_text, best_dtos, best_score = hypotheses[0][0], None, -math.inf
+    for (text, asr_prob), segments in zip(hypotheses, per_hyp):
+        hyp_dtos = [dtos[seg] for seg in segments]
+        score = (asr_weight * math.log(max(asr_prob, 1e-6))
+                 + (1.0 - asr_weight) * math.log(max(_nlu_score(hyp_dtos), 1e-6)))
+        if score > best_score:
+            best_text, best_dtos, best_score = text, hyp_dtos, score
+    # Solo cuenta la hipótesis elegida; con classify, quien llama lleva la cuenta
+    if status_of is not None: _count_fastpath(status_of[seg] for seg in _segment(best_text))
+    return best_text, best_dtos
+
+class IncrementalNLU:
+    """
+    Clasifica los resultados parciales de Vosk mientras el usuario habla.
+    Guarda el DTO de cada segmento, de modo que al llegar el resultado final
+    la intención suele estar ya calculada. on_confident se llama una vez por
+    intención cuando su confianza supera prewarm_threshold (pre-calentado).
+    """
+    def __init__(self, on_confident=None, prewarm_threshold: Optional[float] = None):
+        self.on_confident = on_confident
+        self.prewarm_threshold = prewarm_threshold
+        self.cache_hits = 0
+        self.reset()
+
+    def reset(self):
+        self._cache: Dict[str, Dict] = {}
+        self._status: Dict[str, Optional[str]] = {}
+        self._model = None
+        self._last = ""
+        self._notified = set()
+
+    def _ensure(self, segments: List[str]):
+        model = _active_model
+        if model is not self._model:
+            # El modelo cambió (recarga en caliente): lo calculado ya no vale
+            self._cache, self._status = {}, {}
+            self._model = model
+        missing = [s for s in segments if s not in self._cache]
+        if missing:
+            statuses: List = []
+            for segment, dto, status in zip(missing, _classify_segments(missing, model, statuses), statuses):
+                self._cache[segment] = dto
+                self._status[segment] = status
+        self.cache_hits += len(segments) - len(missing)
+
+    def feed_partial(self, partial_text: str):
+        partial_text = (partial_text or "").strip()
+        if not partial_text or partial_text == self._last: return
+        self._last = partial_text
+        if not _active_model[0]: return
+        segments = _segment(partial_text)
+        self._ensure(segments)
+
+        if not self.on_confident: return
+        threshold = self.prewarm_threshold
+        if threshold is None: threshold = self._model[2].get("prewarm_threshold", 0.3)
+        for segment in segments:
+            dto = self._cache[segment]
+            key = (dto["modulo"], dto["comando"])
+            if dto.get("confianza", 0.0) >= threshold and key not in self._notified:
+                self._notified.add(key)
+                try: self.on_confident(dto)
+                except Exception as e: print(f">>> [PLN] Error en pre-calentado: {e}")
+
+    def finalize(self, text: str) -> List[Dict]:
+        if not _active_model[0]: initialize_pln_model()
+        segments = _segment(text)
+        self._ensure(segments)
+        result = [self._cache[s] for s in segments]
+        _count_fastpath(self._status[s] for s in segments)
+        self.reset()
+        return result
+
+    def _classify_cached(self, segments: List[str]) -> Dict[str, Dict]:
+        self._ensure(segments)
+        return {s: self._cache[s] for s in segments}
+
+    def finalize_nbest(self, hypotheses: List[Tuple[str, float]]) -> Tuple[str, List[Dict]]:
+        """Como finalize, pero reordenando las N mejores; la 1-best suele estar ya en caché."""
+        if not _active_model[0]: initialize_pln_model()
+        result = rerank_hypotheses(hypotheses, classify=self._classify_cached)
+        _count_fastpath(self._status[s] for s in _segment(result[0]) if s in self._status)
+        self.reset()
+        return result
+
+def fastpath_stats() -> Dict[str, Any]:
+    with _stats_lock: stats = dict(_fastpath_stats)
+    total = sum(stats.values())
+    stats["total"] = total
+    stats["hit_rate"] = round(stats[FASTPATH_HIT] / total, 3) if total else 0.0
+    return stats
+
+def process_command(raw_text: str) -> List[Dict]:
+    return process_commands([raw_text])[0]
 
 if __name__ == "__main__":
     train_model()
@@ -4,11 +4,13 @@ import sys
 import os
 import json
 import logging
+import re
 import time
-import pyttsx3
-import pythoncom
+import queue
+import unicodedata
+import threading
+import multiprocessing
 from datetime import datetime
-import modules.web_navigator.teams_manager as mod_teams
 
 if getattr(sys, 'frozen', False):
     BASE_DIR = sys._MEIPASS
@@ -17,154 +19,434 @@ else:
 
 if BASE_DIR not in sys.path: sys.path.append(BASE_DIR)
 
-user_docs = os.path.join(os.path.expanduser("~"), "Documents")
-log_folder = os.path.join(user_docs, "Registros_Lesi")
+from config import LISTEN_TIMEOUT, LISTEN_FOLLOWUP_TIMEOUT, WARM_MODULES, WORKER_MODULES
+from services.startup import StartupOrchestrator
 
-if not os.path.exists(log_folder):
-    try:
-        os.makedirs(log_folder)
-    except: pass
-
-log_filename = f"Lesi_Log_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.txt"
-log_path = os.path.join(log_folder, log_filename)
-
-handlers_list = [logging.StreamHandler(sys.stdout)]
-if os.path.exists(log_folder):
-    handlers_list.append(logging.FileHandler(log_path, encoding='utf-8'))
-
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(message)s',
-    datefmt='%H:%M:%S',
-    handlers=handlers_list
-)
 logger = logging.getLogger("Main")
 
-try:
+# Con multiprocessing "spawn" (Windows) cada proceso hijo -trabajadores de
+# módulos, extracción de PDF- vuelve a ejecutar este nivel como __mp_main__:
+# aquí solo van imports ligeros. El registro y los servicios se cargan en main().
+ear_service = speech_service = audio_capture = registry = memory_report = worker_pool = SLEEP = None
+
+def setup_logging():
+    user_docs = os.path.join(os.path.expanduser("~"), "Documents")
+    log_folder = os.path.join(user_docs, "Registros_Lesi")
+
+    if not os.path.exists(log_folder):
+        try:
+            os.makedirs(log_folder)
+        except: pass
+
+    log_filename = f"Lesi_Log_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.txt"
+    log_path = os.path.join(log_folder, log_filename)
+
+    handlers_list = [logging.StreamHandler(sys.stdout)]
+    if os.path.exists(log_folder):
+        handlers_list.append(logging.FileHandler(log_path, encoding='utf-8'))
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(message)s',
+        datefmt='%H:%M:%S',
+        handlers=handlers_list
+    )
+
+def load_services():
+    global ear_service, speech_service, audio_capture, registry, SLEEP, memory_report, worker_pool
     from services.stt import ear_service
-    from core.pln import process_command, initialize_pln_model
-    
-    import modules.os_control.file_reader as mod_file_reader
-    import modules.office_auto.word_session as mod_office
-    import modules.os_control.system_ops as mod_system
-    import modules.web_navigator.web_search as mod_web
-except ImportError as e:
-    logger.critical(f"Error CRÍTICO de imports: {e}")
-    time.sleep(5) 
-    sys.exit(1)
+    from services.tts import speech_service
+    from services.audio_capture import audio_capture
+    from modules.registry import registry, SLEEP
+    from services.diagnostics import memory_report
+    from services.workers import worker_pool
+    register_handlers()
+
+# Se carga en segundo plano (ver load_pln)
+fastpath_stats = None
 
 def speak_main(text: str):
     if not text: return
-    try:
-        pythoncom.CoInitialize()
-        engine = pyttsx3.init("sapi5")
-        engine.setProperty('rate', 150)
-        engine.setProperty('volume', 1.0)
-        
-        voices = engine.getProperty('voices')
-        for v in voices:
-            if "spanish" in v.name.lower() or "español" in v.name.lower():
-                engine.setProperty('voice', v.id)
+    print(f"   [SISTEMA] {text}")
+    speech_service.speak(text)
+
+# Acciones caras (navegador, Selenium): se confirman si la confianza es baja
+CONFIRM_ACTIONS = {
+    "abrir_teams": "abrir Teams",
+    "investigar_web": "buscar en internet",
+}
+AFFIRMATIVE = ("si", "sí", "claro", "dale", "ok", "confirmo", "hazlo", "adelante")
+
+def confirm_action(cmd, ask) -> bool:
+    accion = CONFIRM_ACTIONS.get(cmd.get('comando'), "continuar")
+    respuesta = ask(f"¿Quieres {accion}? Di sí o no.")
+    return bool(respuesta) and any(w in respuesta.split() for w in AFFIRMATIVE)
+
+# Lo único que se atiende mientras una acción está en curso (interrupción por voz).
+# Frase de parada completa, no la probabilidad del clasificador: con ~22 clases
+# rara vez pasa de 0.35 y la propia voz de Lesi ("diga detener lectura...") puntúa igual.
+STOP_PHRASE = re.compile(
+    r"(?:ya |ok |por favor )?"
+    r"(?:(?:detener|deten|detente|para|parar|pare|cancela|cancelar|termina|terminar|corta|cortar|stop)"
+    r"(?: la| el)? (?:lectura|audio|voz)"
+    r"|deja de leer|para de leer|no leas mas|detente|basta|ya basta|silencio|callate)"
+    r"(?: por favor)?")
+# En un parcial el eco de la lectura puede empezar igual ("para la lectura de..."):
+# ahí solo valen los verbos que no aparecen en un texto corriente
+STOP_WORDS_PARTIAL = {"detener", "deten", "detente", "cancela", "cancelar", "stop", "basta", "callate", "deja"}
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize("NFD", text.lower())
+    return " ".join("".join(c for c in text if not unicodedata.combining(c)).split())
+
+def is_stop_command(text: str, partial: bool = False) -> bool:
+    """La frase entera es una orden de parada ("detener lectura", "para la lectura", "basta")."""
+    t = _normalize(text or "")
+    if not STOP_PHRASE.fullmatch(t): return False
+    if not partial: return True
+    head = re.sub(r"^(?:ya |ok |por favor )", "", t).split()[0]
+    return head in STOP_WORDS_PARTIAL
+
+def prewarm_module(cmd):
+    # Mientras el usuario aún habla: se importa el módulo y se llama a su prewarm()
+    modulo = cmd.get('modulo')
+    logger.info(f"Pre-calentando {modulo} ({cmd.get('confianza', 1.0):.2f})")
+    registry.prewarm(modulo)
+
+def handle_interaction(cmd, deps):
+    if cmd.get('comando') == "despedida":
+        speak_main("Adiós.")
+        return SLEEP
+    speak_main("Hola, estoy aquí.")
+
+def handle_unknown(cmd, deps):
+    speak_main("No te entendí.")
+
+def handle_diagnostics(cmd, deps):
+    logger.info(memory_report.report())
+    speak_main(memory_report.spoken_summary())
+
+def register_handlers():
+    registry.register("interaction", handle_interaction, ("saludo", "despedida"))
+    registry.register("diagnostics", handle_diagnostics, ("informe_memoria",))
+    registry.register("unknown", handle_unknown, ("no_entendido",))
+    registry.register("error", lambda cmd, deps: None)
+    # Navegador y Teams en procesos trabajadores; hora, volumen, lectura y saludo siguen aquí
+    registry.isolate(WORKER_MODULES, worker_pool)
+
+def active_session():
+    """Sesión de dictado abierta (Word o Teams); solo mira módulos ya cargados."""
+    for name in ("office_auto", "teams_manager"):
+        session = registry.session(name)
+        if session: return session
+    return None
+
+def load_tts():
+    speech_service.start()
+    speech_service.warm_prompts()
+
+def load_audio():
+    # Sin cancelación de eco: lo que capta el micrófono mientras Lesi habla se descarta
+    audio_capture.mute_check = speech_service.is_speaking
+    if not audio_capture.start(): raise RuntimeError(f"sin audio ({audio_capture.error})")
+
+def load_stt():
+    if ear_service.load() is None: raise RuntimeError("modelo Vosk no disponible")
+
+def load_pln():
+    global fastpath_stats
+    from core.pln import initialize_pln_model, start_model_watcher, fastpath_stats, IncrementalNLU
+    if not initialize_pln_model(): raise RuntimeError("Fallo al inicializar PLN")
+    start_model_watcher()
+    return IncrementalNLU()
+
+def load_modules():
+    # Solo los módulos baratos; web y Teams se importan al usarlos
+    registry.warm(WARM_MODULES)
+
+def load_file_index():
+    # Re-escaneo espaciado del índice de archivos; entre medias, las búsquedas fallidas lo refrescan
+    from modules.os_control.file_index import file_index
+    file_index.refresh_in_background()
+
+def build_startup() -> StartupOrchestrator:
+    arranque = StartupOrchestrator()
+    arranque.add("tts", load_tts)
+    arranque.add("audio", load_audio)
+    arranque.add("stt", load_stt)
+    arranque.add("pln", load_pln)
+    arranque.add("modulos", load_modules)
+    arranque.add("indice_archivos", load_file_index, after=("modulos",))
+    return arranque
+
+class Utterance:
+    def __init__(self, hypotheses, speech_end=None):
+        self.hypotheses = hypotheses
+        self.text = hypotheses[0][0]
+        self.speech_end = speech_end
+        self.classified = threading.Event()
+
+class VoicePipeline:
+    """
+    Bucle principal en etapas concurrentes unidas por colas: escucha (reposo
+    y comandos), clasificación y ejecución; la voz ya tiene su propio hilo.
+    El reconocedor sigue escuchando durante las acciones largas, de modo que
+    decir "detener lectura" cancela la acción en curso (evento cancel de deps
+    + speech_service.cancel_all()), incluso antes de acabar la frase. Solo se
+    escucha mientras suena contenido (fragmentos de documento o página); los
+    avisos y preguntas de Lesi siguen silenciando el micrófono.
+    """
+    def __init__(self, arranque: StartupOrchestrator):
+        self.arranque = arranque
+        self.utterances = queue.Queue()
+        self.actions = queue.Queue()
+        self.cancel = threading.Event()
+        self.busy = threading.Event()
+        self.stopped = threading.Event()
+        self.awake = False
+        self.sleep_requested = False
+        self.nlu_stream = None
+        self.latencias = []
+        self._reply = None
+        self._barged = False
+        self._timeline_logged = False
+        self.deps = {"tts": speak_main, "stt": ear_service, "cancel": self.cancel, "ask": self.ask}
+        self._threads = []
+
+    def start(self):
+        # Durante una acción larga el micrófono queda abierto para poder interrumpir
+        audio_capture.mute_check = self._muted
+        for name, target in (("Escucha", self._listener), ("PLN", self._classifier), ("Acciones", self._executor)):
+            t = threading.Thread(target=target, name=f"Lesi{name}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self):
+        self.stopped.set()
+        self.cancel.set()
+        self.utterances.put(None)
+        self.actions.put(None)
+        speech_service.cancel_all()
+
+    def wait(self):
+        listener = self._threads[0]
+        while listener.is_alive():
+            listener.join(0.5)
+
+    def _muted(self) -> bool:
+        barge_in_window = self.busy.is_set() and speech_service.is_reading()
+        return speech_service.is_speaking() and not barge_in_window
+
+    def _ensure_nlu(self) -> bool:
+        if self.nlu_stream is None:
+            try:
+                self.nlu_stream = self.arranque.wait("pln")
+            except Exception as e:
+                logger.error(f"Fallo de arranque: {e}")
+                return False
+            self.nlu_stream.on_confident = self._on_confident
+        if not self._timeline_logged:
+            logger.info("Arranque completo:\n" + self.arranque.report())
+            logger.info(memory_report.report())
+            self._timeline_logged = True
+        return True
+
+    # --- Escucha ---
+    def _listener(self):
+        seguimiento = False
+        while not self.stopped.is_set():
+            try:
+                if not self.awake:
+                    despierto, comando_inicial = ear_service.wait_for_wake_word()
+                    if not despierto:
+                        if not audio_capture.running: break
+                        continue
+                    logger.info("¡Wake Word detectada!")
+                    if not self._ensure_nlu(): break
+                    self.awake = True
+                    self.sleep_requested = False
+                    # Tras "Dime." se espera poco: si no hay respuesta, vuelve a reposo
+                    seguimiento = not comando_inicial
+                    if comando_inicial: self._submit(Utterance([(comando_inicial, 1.0)]))
+                    else: speak_main("Dime.")
+                    continue
+
+                self.nlu_stream.reset()
+                self._barged = False
+                # El dictado no pasa por el clasificador
+                dictando = active_session() is not None
+                espera = LISTEN_FOLLOWUP_TIMEOUT if seguimiento else LISTEN_TIMEOUT
+                seguimiento = False
+                hipotesis = ear_service.listen_nbest(timeout=espera, on_partial=None if dictando else self._on_partial)
+                if not hipotesis:
+                    if not audio_capture.running: break
+                    # Con una acción en curso (o esperando respuesta) no se vuelve a reposo
+                    if self.busy.is_set() or self._reply is not None: continue
+                    self._go_to_sleep()
+                    continue
+                self._submit(Utterance(hipotesis, ear_service.last_speech_end))
+            except Exception as e:
+                logger.error(f"Error en escucha: {e}")
+                time.sleep(1)
+
+    def _submit(self, utterance: Utterance):
+        self.utterances.put(utterance)
+        # El parcial y la clasificación comparten caché: se espera a que termine
+        utterance.classified.wait(5)
+        if self.sleep_requested:
+            self.awake = False
+
+    def _go_to_sleep(self):
+        logger.info("Timeout. Volviendo a reposo.")
+        if fastpath_stats: logger.info(f"Vía rápida PLN: {fastpath_stats()}")
+        if self.latencias:
+            logger.info(f"Fin de voz -> PLN: media {sum(self.latencias) / len(self.latencias):.0f} ms en {len(self.latencias)} turnos")
+            self.latencias.clear()
+        speak_main("Hasta luego.")
+        self.awake = False
+
+    def _on_partial(self, text: str):
+        # Con una acción en curso lo que se oye suele ser el eco de la lectura: no pasa por el PLN
+        if self.busy.is_set():
+            if is_stop_command(text, partial=True): self.barge_in(f"parcial '{text}'")
+            return
+        self.nlu_stream.feed_partial(text)
+
+    def _on_confident(self, cmd):
+        if not self.busy.is_set(): prewarm_module(cmd)
+
+    def barge_in(self, origen: str):
+        if not self.busy.is_set() or self.cancel.is_set(): return
+        logger.info(f"Interrupción por voz [{origen}]: cancelando la acción en curso")
+        self._barged = True
+        self.cancel.set()
+        while True:
+            try: self.actions.get_nowait()
+            except queue.Empty: break
+        speech_service.cancel_all()
+
+    # --- Clasificación ---
+    def _classifier(self):
+        while True:
+            utterance = self.utterances.get()
+            if utterance is None: break
+            try:
+                self._classify(utterance)
+            except Exception as e:
+                logger.error(f"Error clasificando: {e}")
+            finally:
+                utterance.classified.set()
+
+    def _classify(self, utterance: Utterance):
+        texto = utterance.text
+        print(f"🗣️: {texto}")
+        logger.info(f"Usuario dijo: {texto}")
+
+        reply = self._reply
+        if reply is not None:
+            reply.put(texto)
+            return
+
+        if not self.busy.is_set() and active_session() is not None:
+            self.actions.put(("dictado", texto))
+            return
+
+        if self._barged:
+            # Ya atendida desde el parcial: la frase completa no se ejecuta otra vez
+            return
+        if self.busy.is_set():
+            if any(is_stop_command(hyp) for hyp, _ in utterance.hypotheses):
+                self.barge_in("frase")
+                return
+            logger.info(f"Acción en curso: se ignora '{texto}'")
+            return
+
+        if utterance.speech_end:
+            self.latencias.append((time.perf_counter() - utterance.speech_end) * 1000)
+            logger.info(f"Fin de voz -> PLN: {self.latencias[-1]:.0f} ms ({ear_service.last_endpoint})")
+        elegido, resultados = self.nlu_stream.finalize_nbest(utterance.hypotheses)
+        if elegido != texto:
+            logger.info(f"N-best: '{texto}' -> '{elegido}'")
+
+        for cmd in resultados:
+            self.actions.put(("comando", cmd))
+            if cmd.get('comando') == "despedida":
+                self.sleep_requested = True
                 break
-        
-        print(f"   [SISTEMA] {text}")
-        engine.say(text)
-        engine.runAndWait()
-        
-    except Exception as e:
-        logger.error(f"Error TTS Main: {e}")
-    finally:
-        try: pythoncom.CoUninitialize()
-        except: pass
 
-def main():
-    logger.info("Iniciando sistema...")
-    if not initialize_pln_model(): 
-        logger.error("Fallo al inicializar PLN")
-        return
+    # --- Ejecución ---
+    def _executor(self):
+        while True:
+            item = self.actions.get()
+            if item is None: break
+            kind, payload = item
+            self.cancel.clear()
+            self.busy.set()
+            try:
+                if kind == "dictado":
+                    sesion = active_session()
+                    if sesion: sesion.process_dictation(payload)
+                else:
+                    self._execute(payload)
+            except Exception as e:
+                logger.error(f"Error ejecutando {kind}: {e}")
+            finally:
+                self.busy.clear()
+
+    def _execute(self, cmd):
+        modulo = cmd.get('modulo')
+        intencion = cmd.get('comando')
+        logger.info(f"Routing a: {modulo} -> {intencion} ({cmd.get('confianza', 1.0):.2f})")
 
-    deps = { "tts": speak_main, "stt": ear_service }
+        if cmd.get('confirmar') and not confirm_action(cmd, self.ask):
+            logger.info(f"Acción descartada por baja confianza: {intencion}")
+            return
+        if registry.dispatch(cmd, self.deps) == SLEEP:
+            self.awake = False
 
-    while True:
+    def ask(self, question: str, timeout: float = 8.0):
+        """Pregunta desde una acción; la siguiente frase va como respuesta, no al PLN."""
+        reply = queue.Queue()
+        self._reply = reply
         try:
-            despierto, comando_inicial = ear_service.wait_for_wake_word()
-
-            if despierto:
-                logger.info("¡Wake Word detectada!")
-                texto_a_procesar = comando_inicial if comando_inicial else None
-                
-                if not texto_a_procesar:
-                    speak_main("Dime.")
-
-                while True:
-                    if not texto_a_procesar:
-                        texto = ear_service.listen(timeout=100)
-                        if not texto:
-                            logger.info("Timeout. Volviendo a reposo.")
-                            speak_main("Hasta luego.")
-                            break 
-                    else:
-                        texto = texto_a_procesar
-                        texto_a_procesar = None
-
-                    print(f"🗣️: {texto}")
-                    logger.info(f"Usuario dijo: {texto}")
-
-                    if mod_office.word_session.is_active:
-                        if "guardar" in texto or "cerrar" in texto:
-                            mod_office.word_session.process_dictation(texto)
-                        else:
-                            mod_office.word_session.process_dictation(texto)
-                        continue
-                    
-                    if mod_teams.teams_manager.is_active:
-                        mod_teams.teams_manager.process_dictation(texto)
-                        continue
+            speak_main(question)
+            return reply.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        finally:
+            self._reply = None
 
-                    resultados = process_command(texto)
-                    should_sleep = False 
-
-                    for cmd in resultados:
-                        modulo = cmd.get('modulo')
-                        intencion = cmd.get('comando')
-                        logger.info(f"Routing a: {modulo} -> {intencion}")
-
-                        if modulo == "file_reader":
-                            mod_file_reader.execute_module(cmd, deps)
-                        
-                        elif modulo == "office_auto":
-                            if intencion == "crear_word":
-                                mod_office.word_session.start_session()
-                        
-                        elif modulo == "interaction":
-                            if intencion == "despedida":
-                                speak_main("Adiós.")
-                                should_sleep = True 
-                                break 
-                            else:
-                                speak_main("Hola, estoy aquí.")
-                        
-                        elif modulo == "web_search":
-                            mod_web.execute_module(cmd, deps)
-                            
-                        elif modulo == "teams_manager":
-                            mod_teams.execute_module(cmd, deps)
-                        
-                        elif modulo == "os_control":
-                            mod_system.execute_module(cmd, deps)
-
-                        elif modulo == "unknown":
-                            speak_main("No te entendí.")
-                    
-                    if should_sleep:
-                        break
-
-        except KeyboardInterrupt:
-            logger.info("Apagado manual.")
-            break
-        except Exception as e:
-            logger.error(f"Error Main Loop: {e}")
-            time.sleep(1)
+def main():
+    setup_logging()
+    try:
+        load_services()
+    except ImportError as e:
+        logger.critical(f"Error CRÍTICO de imports: {e}")
+        time.sleep(5)
+        sys.exit(1)
+
+    logger.info("Iniciando sistema...")
+    arranque = build_startup()
+    arranque.start()
+    try:
+        # El reposo empieza en cuanto hay audio y modelo acústico; el resto sigue cargando
+        arranque.wait("audio")
+        arranque.wait("stt")
+    except Exception as e:
+        logger.critical(f"No se puede escuchar: {e}")
+        return
+    logger.info("Escucha lista:\n" + arranque.report())
+
+    pipeline = VoicePipeline(arranque)
+    pipeline.start()
+    try:
+        pipeline.wait()
+    except KeyboardInterrupt:
+        logger.info("Apagado manual.")
+    finally:
+        pipeline.stop()
+        worker_pool.shutdown()
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -7,6 +7,9 @@ import keyboard
 from docx import Document
 from docx.shared import Pt
 from docx.enum.text import WD_ALIGN_PARAGRAPH
+from services.tts import speech_service
+from services.diagnostics import memory_report
+from services.workers import worker_pool
 
 class WordSession:
     def __init__(self):
@@ -15,25 +18,12 @@ class WordSession:
         self.download_path = os.path.join(os.path.expanduser("~"), "Downloads")
 
     def _speak_local(self, text):
-        try:
-            import pyttsx3, pythoncom
-            pythoncom.CoInitialize()
-            engine = pyttsx3.init("sapi5")
-            engine.setProperty('rate', 150)
-            voices = engine.getProperty('voices')
-            for v in voices:
-                if "spanish" in v.name.lower() or "español" in v.name.lower():
-                    engine.setProperty('voice', v.id)
-                    break
-            engine.say(text)
-            engine.runAndWait()
-        except: pass
-        finally:
-            try: pythoncom.CoUninitialize()
-            except: pass
+        speech_service.speak(text)
 
     def start_session(self, initial_filename: str = None) -> str:
-        self.doc = Document()
+        memory_report.forget("documento_word")
+        with memory_report.track("documento_word"):
+            self.doc = Document()
         self.is_active = True
         self._speak_local("Editor listo. Di 'Título', 'Párrafo', 'Oración', 'Dictado' o 'Salir'.")
 
@@ -87,16 +77,11 @@ class WordSession:
         elif align == "JUSTIFY": p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
 
     def _convert_to_pdf(self, docx_path, pdf_path):
-        try:
-            import comtypes.gen
-            word_app = comtypes.client.CreateObject('Word.Application')
-            word_app.Visible = False
-            doc = word_app.Documents.Open(docx_path)
-            doc.SaveAs(pdf_path, FileFormat=17)
-            doc.Close()
-            word_app.Quit()
-            return True
-        except: return False
+        # Word por COM se puede quedar colgado: la conversión va en un trabajador con límite de tiempo
+        try: return bool(worker_pool.call(__name__, "convert_to_pdf", docx_path, pdf_path))
+        except Exception as e:
+            print(f"   [WORD] Conversión a PDF fallida: {e}")
+            return False
 
     def _save_file(self, raw_input):
         format_type = "pdf" if "pdf" in raw_input.lower() else "docx"
@@ -126,6 +111,7 @@ class WordSession:
 
             self.is_active = False
             self.doc = None
+            memory_report.forget("documento_word")
             self._speak_local(msg)
 
         except Exception as e:
@@ -135,6 +121,7 @@ class WordSession:
         if keyboard.is_pressed('esc') or keyboard.is_pressed('ctrl'):
             self.is_active = False
             self.doc = None
+            memory_report.forget("documento_word")
             self._speak_local("Edición cancelada por teclado.")
             return
 
@@ -145,6 +132,7 @@ class WordSession:
         if text_lower in ["salir", "cancelar", "cerrar", "abortar", "cancelar documento"]:
             self.is_active = False
             self.doc = None
+            memory_report.forget("documento_word")
             self._speak_local("Edición cancelada.")
             return
 
@@ -180,4 +168,25 @@ class WordSession:
             print(f"   [WORD IGNORADO] '{text}'")
             return 
 
-word_session = WordSession()
\ No newline at end of file
+def convert_to_pdf(docx_path, pdf_path):
+    try:
+        import comtypes.gen
+        word_app = comtypes.client.CreateObject('Word.Application')
+        word_app.Visible = False
+        doc = word_app.Documents.Open(docx_path)
+        doc.SaveAs(pdf_path, FileFormat=17)
+        doc.Close()
+        word_app.Quit()
+        return True
+    except: return False
+
+word_session = WordSession()
+
+def active_session():
+    return word_session if word_session.is_active else None
+
+INTENTS = ("crear_word",)
+
+def execute_module(dto, dependencies):
+    if dto.get('comando') == "crear_word":
+        word_session.start_session()
@@ -0,0 +1,253 @@
+# file_index.py
+
+import os
+import json
+import time
+import difflib
+import threading
+from typing import Dict, List, Optional, Set
+from config import LESI_HOME, FILE_INDEX_ROOTS, FILE_INDEX_MAX_DEPTH, FILE_INDEX_REFRESH_S
+
+INDEX_PATH = os.path.join(LESI_HOME, "file_index.json")
+VALID_EXTS = ('.pdf', '.docx', '.txt')
+# Entre dos re-escaneos a demanda (búsquedas sin resultado seguidas)
+REFRESH_INTERVAL = 2.0
+FIRST_SCAN_WAIT = 10.0
+FUZZY_CANDIDATES = 50
+
+def _trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class FileIndex:
+    """
+    Índice persistente de nombres de archivo sobre las carpetas configuradas.
+    Se actualiza de forma incremental comparando el mtime de cada carpeta: de
+    vez en cuando desde un hilo (lo arranca main) y al momento cuando una
+    búsqueda no encuentra nada. search() consulta la memoria (prefijo /
+    subcadena / similitud mediante un índice de trigramas).
+    """
+    def __init__(self, roots: Optional[List[str]] = None, max_depth: int = FILE_INDEX_MAX_DEPTH,
+                 index_path: Optional[str] = INDEX_PATH):
+        self.roots = [os.path.abspath(r) for r in (roots or FILE_INDEX_ROOTS.values())]
+        self.max_depth = max_depth
+        self.index_path = index_path
+        self._dirs: Dict[str, Dict] = {}
+        self._names: Dict[str, str] = {}
+        self._trigram_index: Dict[str, Set[str]] = {}
+        self._lock = threading.RLock()
+        self._scan_lock = threading.Lock()
+        self._last_refresh = 0.0
+        self._loaded = False
+        self._ready = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+        self._watcher_stop = threading.Event()
+
+    # --- Persistencia ---
+    def load(self):
+        with self._lock:
+            self._loaded = True
+            if not self.index_path or not os.path.exists(self.index_path): return
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get("max_depth") != self.max_depth: return
+                self._dirs = data.get("dirs", {})
+            except Exception as e:
+                print(f"   [INDEX] Índice dañado, se reconstruye: {e}")
+                self._dirs = {}
+            for d, entry in self._dirs.items():
+                for name in entry["files"]:
+                    self._add_file(os.path.join(d, name))
+            # Con un índice guardado se puede responder antes del primer escaneo
+            if self._dirs: self._ready.set()
+
+    def save(self):
+        if not self.index_path: return
+        with self._lock:
+            data = {"max_depth": self.max_depth, "dirs": self._dirs}
+        try:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            tmp = self.index_path + ".tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp, self.index_path)
+        except Exception as e:
+            print(f"   [INDEX] No se pudo guardar: {e}")
+
+    # --- Mantenimiento ---
+    def _add_file(self, path):
+        name = os.path.basename(path).lower()
+        self._names[path] = name
+        for tg in _trigrams(name):
+            self._trigram_index.setdefault(tg, set()).add(path)
+
+    def _remove_file(self, path):
+        name = self._names.pop(path, None)
+        if name is None: return
+        for tg in _trigrams(name):
+            bucket = self._trigram_index.get(tg)
+            if bucket:
+                bucket.discard(path)
+                if not bucket: del self._trigram_index[tg]
+
+    def _drop_dir(self, d):
+        entry = self._dirs.pop(d, None)
+        if not entry: return
+        for name in entry["files"]:
+            self._remove_file(os.path.join(d, name))
+        for sub in entry["subdirs"]:
+            self._drop_dir(os.path.join(d, sub))
+
+    def _scan_dir(self, d, depth, seen):
+        # Se recorre sin el candado de consultas; solo se toma para modificar el índice
+        seen.add(d)
+        try: mtime = os.stat(d).st_mtime
+        except OSError:
+            with self._lock: self._drop_dir(d)
+            return False
+
+        entry = self._dirs.get(d)
+        changed = False
+        if entry is None or entry["mtime"] != mtime:
+            files, subdirs = [], []
+            try:
+                with os.scandir(d) as it:
+                    for e in it:
+                        try:
+                            if e.is_dir(follow_symlinks=False):
+                                if not e.name.startswith('.'): subdirs.append(e.name)
+                            elif e.name.lower().endswith(VALID_EXTS) and not e.name.startswith("~$"):
+                                files.append(e.name)
+                        except OSError: continue
+            except OSError: return False
+
+            old_files = set(entry["files"]) if entry else set()
+            with self._lock:
+                for name in old_files - set(files):
+                    self._remove_file(os.path.join(d, name))
+                for name in set(files) - old_files:
+                    self._add_file(os.path.join(d, name))
+                self._dirs[d] = {"mtime": mtime, "files": files, "subdirs": subdirs}
+            entry = self._dirs[d]
+            changed = True
+
+        if depth < self.max_depth:
+            for sub in entry["subdirs"]:
+                changed |= self._scan_dir(os.path.join(d, sub), depth + 1, seen)
+        return changed
+
+    def add_root(self, root):
+        root = os.path.abspath(root)
+        if root in self.roots: return
+        self.roots.append(root)
+        # Carpeta nueva: se indexa ya, la consulta que la pidió viene a continuación
+        if os.path.isdir(root):
+            with self._scan_lock:
+                changed = self._scan_dir(root, 0, set())
+            if changed: self.save()
+
+    def refresh(self, force: bool = False) -> bool:
+        """Re-escanea solo las carpetas cuyo mtime cambió. Devuelve True si hubo cambios."""
+        with self._scan_lock:
+            if not self._loaded: self.load()
+            now = time.time()
+            if not force and now - self._last_refresh < REFRESH_INTERVAL: return False
+            self._last_refresh = now
+
+            seen: Set[str] = set()
+            changed = False
+            for root in list(self.roots):
+                if os.path.isdir(root):
+                    changed |= self._scan_dir(root, 0, seen)
+            with self._lock:
+                for d in [d for d in self._dirs if d not in seen]:
+                    self._drop_dir(d)
+                    changed = True
+            self._ready.set()
+
+        if changed: self.save()
+        return changed
+
+    def _watch(self, interval):
+        while True:
+            try: self.refresh(force=True)
+            except Exception as e: print(f"   [INDEX] Error actualizando: {e}")
+            if self._watcher_stop.wait(interval): return
+
+    def refresh_in_background(self, interval: float = FILE_INDEX_REFRESH_S):
+        """Re-escanea cada interval segundos desde un hilo (el primer escaneo, enseguida)."""
+        if interval <= 0: return
+        if self._watcher and self._watcher.is_alive(): return
+        self._watcher_stop.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name="LesiFileIndex", daemon=True)
+        self._watcher.start()
+
+    def stop_background(self):
+        self._watcher_stop.set()
+
+    # --- Consultas ---
+    def _candidates(self, query) -> Optional[Set[str]]:
+        # Solo trigramas internos: los del relleno exigirían que el nombre empiece/termine igual
+        inner = {query[i:i + 3] for i in range(len(query) - 2)}
+        if not inner: return None
+        grams = sorted(inner, key=lambda g: len(self._trigram_index.get(g, ())))
+        result = None
+        for g in grams:
+            bucket = self._trigram_index.get(g)
+            if not bucket: return set()
+            result = set(bucket) if result is None else result & bucket
+            if not result: return result
+        return result
+
+    def _under(self, path, folder):
+        return folder is None or path.startswith(folder + os.sep)
+
+    def _order(self, paths):
+        return sorted(paths, key=lambda p: (p.count(os.sep), self._names[p]))
+
+    def search(self, query: str, folder: Optional[str] = None) -> Optional[str]:
+        """Prefijo, luego subcadena, luego similitud (mismo orden que la búsqueda lineal)."""
+        query = (query or "").lower().strip()
+        if not query: return None
+        if not self._ready.is_set():
+            # Sin índice guardado: la primera consulta espera al primer escaneo
+            if self._watcher is None or not self._watcher.is_alive(): self.refresh()
+            else: self._ready.wait(FIRST_SCAN_WAIT)
+        folder = os.path.abspath(folder) if folder else None
+
+        found = self._lookup(query, folder)
+        if found is None or not os.path.exists(found):
+            # Sin resultado (o ya borrado): el archivo puede ser nuevo; se re-escanea y se repite
+            if self.refresh(): found = self._lookup(query, folder)
+        return found
+
+    def _lookup(self, query: str, folder: Optional[str]) -> Optional[str]:
+        with self._lock:
+            candidates = self._candidates(query)
+            if candidates is None:
+                candidates = set(self._names)
+            pool = [p for p in candidates if self._under(p, folder)]
+
+            prefix = [p for p in pool if self._names[p].startswith(query)]
+            if prefix: return self._order(prefix)[0]
+            substring = [p for p in pool if query in self._names[p]]
+            if substring: return self._order(substring)[0]
+
+            # Similitud: se puntúan solo los archivos que comparten más trigramas
+            scores: Dict[str, int] = {}
+            for g in _trigrams(query):
+                for p in self._trigram_index.get(g, ()):
+                    if self._under(p, folder): scores[p] = scores.get(p, 0) + 1
+            best = sorted(scores, key=scores.get, reverse=True)[:FUZZY_CANDIDATES]
+            best_path, best_ratio = None, 0.4
+            for p in best:
+                ratio = difflib.SequenceMatcher(None, query, self._names[p]).ratio()
+                if ratio >= best_ratio:
+                    best_path, best_ratio = p, ratio
+            return best_path
+
+    def __len__(self):
+        return len(self._names)
+
+file_index = FileIndex()
@@ -1,75 +1,225 @@
 # file_reader.py
 
 import os
-import difflib
 import re
-import pyttsx3
-import pythoncom
+import mmap
+import json
+import codecs
 import time
+import queue
+import threading
 import keyboard
 from docx import Document
-from PyPDF2 import PdfReader
+from config import LESI_HOME, FILE_INDEX_ROOTS
+from services.tts import speech_service, PRIORITY_LOW
+from modules.os_control.file_index import file_index
+from modules.os_control.text_cache import text_cache
+from modules.os_control.pdf_extract import iter_pdf_pages
 
-def _speak_interruptible(text):
-    was_cancelled = False
-    try:
-        pythoncom.CoInitialize()
-        engine = pyttsx3.init("sapi5")
-        engine.setProperty('rate', 150)
-        
-        voices = engine.getProperty('voices')
-        for v in voices:
-            if "spanish" in v.name.lower() or "español" in v.name.lower():
-                engine.setProperty('voice', v.id)
-                break
+POSITIONS_PATH = os.path.join(LESI_HOME, "read_positions.json")
+CHUNK_MAX_CHARS = 400
+PREFETCH_CHUNKS = 32
+CACHED_EXTS = ('.pdf', '.docx')
+TXT_BLOCK_BYTES = 64 * 1024
 
-        def onWord(name, location, length):
-            nonlocal was_cancelled
-            if keyboard.is_pressed('ctrl') or keyboard.is_pressed('esc'):
-                was_cancelled = True
-                engine.stop()
+_SENTENCE_END = re.compile(r'(?<=[.!?;:])\s+')
+_END = object()
 
-        engine.connect('started-word', onWord)
+def _key_cancel():
+    return keyboard.is_pressed('ctrl') or keyboard.is_pressed('esc')
 
-        clean_text = text.replace('\n', ' ').replace('\r', '')
-        
-        print("   [READER] Leyendo... (Presiona CTRL o ESC para cancelar)")
-        
-        time.sleep(1) 
-        
-        engine.say(clean_text)
-        engine.runAndWait()
-        
+def _extract_blocks(path):
+    """Devuelve el texto por bloques (página PDF, párrafo DOCX) a medida que se extrae."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.pdf':
+        for t in iter_pdf_pages(path):
+            if t: yield t
+    elif ext == '.docx':
+        doc = Document(path)
+        for p in doc.paragraphs:
+            if p.text: yield p.text
+    elif ext == '.txt':
+        yield from _iter_txt_blocks(path)
+
+def _iter_txt_blocks(path, block_bytes=TXT_BLOCK_BYTES):
+    """
+    Lee el .txt a través de un mmap y decodifica por bloques, cortando en el
+    último espacio para no partir palabras. La memoria no depende del tamaño.
+    """
+    if os.path.getsize(path) == 0: return
+    decoder = codecs.getincrementaldecoder('utf-8-sig')(errors='replace')
+    pending = ""
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for start in range(0, len(mm), block_bytes):
+            text = pending + decoder.decode(mm[start:start + block_bytes])
+            cut = max(text.rfind(' '), text.rfind('\n'))
+            if cut <= 0 and len(text) < 4 * block_bytes:
+                pending = text
+                continue
+            if cut <= 0: cut = len(text)
+            pending = text[cut + 1:]
+            yield text[:cut]
+    tail = pending + decoder.decode(b"", final=True)
+    if tail.strip(): yield tail
+
+def _iter_text_blocks(path):
+    """Igual que _extract_blocks pero sirve desde la caché si el archivo ya se extrajo."""
+    if not path.lower().endswith(CACHED_EXTS):
+        yield from _extract_blocks(path)
+        return
+
+    pages = text_cache.get(path)
+    if pages is not None:
+        print("   [READER] Texto recuperado de la caché.")
+        yield from pages
+        return
+
+    pages = []
+    for block in _extract_blocks(path):
+        pages.append(block)
+        yield block
+    text_cache.put(path, pages)
+
+def _split_chunks(blocks, max_chars=CHUNK_MAX_CHARS):
+    """Agrupa oraciones en fragmentos de hasta max_chars sin esperar al resto del documento."""
+    buffer = ""
+    for block in blocks:
+        clean = block.replace('\r', '').replace('\n', ' ').strip()
+        if not clean: continue
+        for sentence in _SENTENCE_END.split(clean):
+            sentence = sentence.strip()
+            if not sentence: continue
+            if buffer and len(buffer) + len(sentence) + 1 > max_chars:
+                yield buffer
+                buffer = ""
+            buffer = f"{buffer} {sentence}" if buffer else sentence
+    if buffer: yield buffer
+
+class _ChunkProducer(threading.Thread):
+    """Extrae y trocea el documento en segundo plano mientras se lee el primer fragmento."""
+    def __init__(self, path):
+        super().__init__(name="LesiReader", daemon=True)
+        self.path = path
+        self.chunks = queue.Queue(maxsize=PREFETCH_CHUNKS)
+        self.error = None
+        self._halt = threading.Event()
+        # Tras cancelar se termina de extraer para dejar el documento en caché
+        self._finish_on_halt = path.lower().endswith(CACHED_EXTS)
+
+    def run(self):
+        try:
+            for chunk in _split_chunks(_iter_text_blocks(self.path)):
+                while not self._halt.is_set():
+                    try:
+                        self.chunks.put(chunk, timeout=0.2)
+                        break
+                    except queue.Full: continue
+                if self._halt.is_set() and not self._finish_on_halt: return
+        except Exception as e:
+            self.error = e
+            print(f"   [READER] Error extrayendo: {e}")
+        finally:
+            self._put_end()
+
+    def _put_end(self):
+        while not self._halt.is_set():
+            try:
+                self.chunks.put(_END, timeout=0.2)
+                return
+            except queue.Full: continue
+
+    def next_chunk(self):
+        return self.chunks.get()
+
+    def stop(self):
+        self._halt.set()
+
+def _file_stamp(path):
+    st = os.stat(path)
+    return [st.st_size, int(st.st_mtime)]
+
+def _load_positions():
+    try:
+        with open(POSITIONS_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except: return {"files": {}, "last": None}
+
+def _save_positions(data):
+    try:
+        os.makedirs(LESI_HOME, exist_ok=True)
+        tmp = POSITIONS_PATH + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, POSITIONS_PATH)
     except Exception as e:
-        print(f"   [TTS ERROR] {e}")
-    finally:
-        try: pythoncom.CoUninitialize()
-        except: pass
-        
-    return was_cancelled
+        print(f"   [READER] No se pudo guardar la posición: {e}")
 
-def _extract_text(path):
-    print(f"   [READER] Extrayendo: {os.path.basename(path)}")
-    ext = os.path.splitext(path)[1].lower()
-    text = ""
+def get_resume_position(path):
+    entry = _load_positions()["files"].get(os.path.abspath(path))
+    if not entry: return 0
     try:
-        if ext == '.pdf':
-            reader = PdfReader(path)
-            if reader.is_encrypted:
-                try: reader.decrypt('')
-                except: pass
-            
-            for page in reader.pages:
-                t = page.extract_text()
-                if t: text += t + " "
-        elif ext == '.docx':
-            doc = Document(path)
-            text = "\n".join([p.text for p in doc.paragraphs])
-        elif ext == '.txt':
-            with open(path, 'r', encoding='utf-8') as f:
-                text = f.read()
-    except: return None
-    return text
+        if entry.get("stamp") != _file_stamp(path): return 0
+    except OSError: return 0
+    return entry.get("chunk", 0)
+
+def _remember_position(path, chunk_index):
+    data = _load_positions()
+    key = os.path.abspath(path)
+    if chunk_index is None:
+        data["files"].pop(key, None)
+        if data.get("last") == key: data["last"] = None
+    else:
+        data["files"][key] = {"chunk": chunk_index, "stamp": _file_stamp(path)}
+        data["last"] = key
+    _save_positions(data)
+
+def read_document(path, system_speak, start_chunk=0, cancel=None):
+    """
+    Lectura en streaming: la voz arranca con el primer fragmento mientras
+    el resto se sigue extrayendo. Guarda el fragmento donde se canceló
+    (teclado, o el evento cancel cuando el usuario dice "detener lectura").
+    """
+    def should_stop():
+        return _key_cancel() or (cancel is not None and cancel.is_set())
+
+    nombre = os.path.basename(path)
+    print(f"   [READER] Extrayendo: {nombre}")
+    producer = _ChunkProducer(path)
+    producer.start()
+
+    try:
+        idx = 0
+        chunk = producer.next_chunk()
+        while chunk is not _END and idx < start_chunk:
+            idx += 1
+            chunk = producer.next_chunk()
+
+        if chunk is _END:
+            if idx > 0:
+                _remember_position(path, None)
+                system_speak("Fin del documento.")
+            else:
+                system_speak("El archivo está vacío.")
+            return
+
+        if start_chunk: system_speak(f"Continuando {nombre}. Diga detener lectura o presione CONTROL para parar.")
+        else: system_speak(f"Leyendo {nombre}. Diga detener lectura o presione CONTROL para parar.")
+        time.sleep(1)
+        print("   [READER] Leyendo... (Presiona CTRL o ESC para cancelar)")
+
+        while chunk is not _END:
+            handle = speech_service.speak(chunk, priority=PRIORITY_LOW, interrupt_check=should_stop)
+            if handle.cancelled or should_stop():
+                _remember_position(path, idx)
+                system_speak("Lectura cancelada.")
+                return
+            idx += 1
+            chunk = producer.next_chunk()
+
+        _remember_position(path, None)
+        system_speak("Fin del documento.")
+    finally:
+        producer.stop()
 
 def _clean_query_name(raw_name):
     if not raw_name: return ""
@@ -80,29 +230,18 @@ def _clean_query_name(raw_name):
     return clean.strip()
 
 def _get_target_path(folder_name):
-    user_home = os.path.expanduser("~")
-    if not folder_name: return os.path.join(user_home, "Downloads")
+    default = FILE_INDEX_ROOTS["descargas"]
+    if not folder_name: return default
     folder = folder_name.lower().strip()
-    mapping = { "descargas": "Downloads", "escritorio": "Desktop", "documentos": "Documents" }
-    target = mapping.get(folder, "Downloads")
-    return os.path.join(user_home, target)
+    return FILE_INDEX_ROOTS.get(folder, default)
 
 def find_file_strict(filename_query, search_path):
     print(f"   [DEBUG] Buscando '{filename_query}' en '{search_path}'")
     if not filename_query or not os.path.exists(search_path): return None
-    try:
-        valid_exts = ('.pdf', '.docx', '.txt')
-        files = [f for f in os.listdir(search_path) if f.lower().endswith(valid_exts)]
-    except: return None
-
-    query = filename_query.lower().strip()
-    for f in files:
-        if f.lower().startswith(query): return os.path.join(search_path, f)
-    for f in files:
-        if query in f.lower() and not f.startswith("~$"): return os.path.join(search_path, f)
-    matches = difflib.get_close_matches(query, files, n=1, cutoff=0.4)
-    if matches: return os.path.join(search_path, matches[0])
-    return None
+    file_index.add_root(search_path)
+    return file_index.search(filename_query, search_path)
+
+INTENTS = ("leer_documento", "continuar_lectura", "detener_lectura")
 
 def execute_module(dto, dependencies):
     cmd = dto.get('comando')
@@ -129,24 +268,27 @@ def execute_module(dto, dependencies):
             real_file = find_file_strict(fname, target_path)
         
         if real_file:
-            nombre = os.path.basename(real_file)
-            
-            contenido = _extract_text(real_file)
-            if not contenido or len(contenido.strip()) < 5:
-                system_speak("El archivo está vacío.")
-                return
+            read_document(real_file, system_speak, cancel=dependencies.get('cancel'))
+        else:
+            system_speak(f"No encontré el archivo {fname}.")
 
-            system_speak(f"Leyendo {nombre}. Presione CONTROL o ESCAPE para detener.")
-            
-            time.sleep(3)
+    elif cmd == "continuar_lectura":
+        raw_fname = vars.get('file_name')
+        fname = _clean_query_name(raw_fname)
+        real_file = None
+        if len(fname) >= 2:
+            real_file = find_file_strict(fname, _get_target_path(vars.get('directory')))
+        else:
+            real_file = _load_positions().get("last")
 
-            fue_cancelado = _speak_interruptible(contenido)
+        if not real_file or not os.path.exists(real_file):
+            system_speak("No hay ninguna lectura pendiente.")
+            return
+        read_document(real_file, system_speak, get_resume_position(real_file), cancel=dependencies.get('cancel'))
 
-            if fue_cancelado:
-                system_speak("Lectura cancelada.")
-            else:
-                system_speak("Fin del documento.")
-        else:
-            system_speak(f"No encontré el archivo {fname}.")
+    elif cmd == "detener_lectura":
+        # Con una lectura en curso lo atiende la interrupción por voz de main
+        system_speak("No hay ninguna lectura en curso.")
     else:
-        system_speak("Comando no reconocido.")
\ No newline at end of file
+        system_speak("Comando no reconocido.")
+
@@ -0,0 +1,63 @@
+# pdf_extract.py
+# Lo importan los procesos hijos del pool. Con "spawn" (Windows) cada hijo
+# vuelve a ejecutar además el nivel superior de main.py, que se mantiene ligero.
+
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional
+from PyPDF2 import PdfReader
+from config import PDF_PARALLEL
+
+PARALLEL_MIN_PAGES = 24
+PAGES_PER_TASK = 8
+
+def _open(path):
+    reader = PdfReader(path)
+    if reader.is_encrypted:
+        try: reader.decrypt('')
+        except: pass
+    return reader
+
+def _extract_range(path, start, stop) -> List[str]:
+    reader = _open(path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+def available_workers() -> int:
+    try: cores = len(os.sched_getaffinity(0))
+    except AttributeError: cores = os.cpu_count() or 1
+    # Se deja un núcleo libre para el bucle de voz
+    return max(1, cores - 1)
+
+def _ranges(n_pages, size):
+    # El primer rango es de una sola página para que la lectura arranque cuanto antes
+    yield 0, min(1, n_pages)
+    for start in range(1, n_pages, size):
+        yield start, min(start + size, n_pages)
+
+def iter_pdf_pages(path, workers: Optional[int] = None, parallel: Optional[bool] = None) -> Iterator[str]:
+    """
+    Texto de cada página, en orden. Con PDF_PARALLEL y muchas páginas reparte
+    rangos entre procesos; si no (o con un solo núcleo) extrae en serie.
+    """
+    reader = _open(path)
+    n_pages = len(reader.pages)
+    workers = min(workers or available_workers(), available_workers())
+    if parallel is None:
+        parallel = PDF_PARALLEL and n_pages >= PARALLEL_MIN_PAGES and workers > 1
+
+    if not parallel:
+        for page in reader.pages:
+            yield page.extract_text() or ""
+        return
+
+    del reader
+    # "spawn" también en Linux: así el benchmark mide el mismo arranque de procesos que en Windows
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        futures = [pool.submit(_extract_range, path, start, stop) for start, stop in _ranges(n_pages, PAGES_PER_TASK)]
+        for future in futures:
+            for text in future.result():
+                yield text
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
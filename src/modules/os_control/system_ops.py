@@ -3,9 +3,9 @@
 import datetime
 import time
 import re
-import pyttsx3
 import pythoncom
 import keyboard 
+from services.tts import speech_service
 from ctypes import cast, POINTER
 from comtypes import CLSCTX_ALL
 
@@ -17,23 +17,8 @@ except ImportError:
 
 class SystemManager:
     def _speak_local(self, text):
-        try:
-            pythoncom.CoInitialize()
-            engine = pyttsx3.init("sapi5")
-            engine.setProperty('rate', 150)
-            engine.setProperty('volume', 1.0)
-            voices = engine.getProperty('voices')
-            for v in voices:
-                if "spanish" in v.name.lower() or "español" in v.name.lower():
-                    engine.setProperty('voice', v.id)
-                    break
-            print(f"   [SYSTEM] {text}")
-            engine.say(text)
-            engine.runAndWait()
-        except: pass
-        finally:
-            try: pythoncom.CoUninitialize()
-            except: pass
+        print(f"   [SYSTEM] {text}")
+        speech_service.speak(text)
 
     def say_time(self):
         now = datetime.datetime.now()
@@ -120,6 +105,8 @@ class SystemManager:
 
 sys_manager = SystemManager()
 
+INTENTS = ("consultar_hora", "consultar_fecha", "ajustar_volumen")
+
 def execute_module(dto, dependencies):
     cmd = dto.get('comando')
     vars = dto.get('variables', {})
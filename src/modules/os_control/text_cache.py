@@ -0,0 +1,85 @@
+# text_cache.py
+
+import os
+import json
+import zlib
+import hashlib
+import threading
+from typing import List, Optional
+from config import LESI_HOME
+
+CACHE_DIR = os.path.join(LESI_HOME, "text_cache")
+MAX_CACHE_BYTES = 200 * 1024 * 1024
+
+class TextCache:
+    """
+    Caché en disco del texto ya extraído, por página, indexada por
+    (ruta, tamaño, mtime). Cada entrada es JSON comprimido con zlib y el
+    directorio se recorta por LRU (mtime de la entrada = último acceso).
+    """
+    def __init__(self, cache_dir: str = CACHE_DIR, max_bytes: int = MAX_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _entry_path(self, path) -> Optional[str]:
+        try: st = os.stat(path)
+        except OSError: return None
+        raw = f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}"
+        return os.path.join(self.cache_dir, hashlib.sha1(raw.encode('utf-8')).hexdigest() + ".z")
+
+    def get(self, path) -> Optional[List[str]]:
+        entry = self._entry_path(path)
+        if not entry or not os.path.exists(entry): return None
+        try:
+            with open(entry, 'rb') as f:
+                pages = json.loads(zlib.decompress(f.read()).decode('utf-8'))
+            os.utime(entry)
+            return pages
+        except Exception:
+            try: os.remove(entry)
+            except: pass
+            return None
+
+    def put(self, path, pages: List[str]):
+        entry = self._entry_path(path)
+        if not entry: return
+        data = zlib.compress(json.dumps(pages, ensure_ascii=False).encode('utf-8'), 6)
+        if len(data) > self.max_bytes: return
+        with self._lock:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                tmp = entry + ".tmp"
+                with open(tmp, 'wb') as f: f.write(data)
+                os.replace(tmp, entry)
+            except Exception as e:
+                print(f"   [CACHE] No se pudo guardar el texto: {e}")
+                return
+            self._evict()
+
+    def _evict(self):
+        try:
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith(".z"): continue
+                full = os.path.join(self.cache_dir, name)
+                st = os.stat(full)
+                entries.append((st.st_mtime, st.st_size, full))
+        except OSError: return
+
+        total = sum(e[1] for e in entries)
+        for _, size, full in sorted(entries):
+            if total <= self.max_bytes: break
+            try:
+                os.remove(full)
+                total -= size
+            except OSError: pass
+
+    def clear(self):
+        with self._lock:
+            if not os.path.isdir(self.cache_dir): return
+            for name in os.listdir(self.cache_dir):
+                try: os.remove(os.path.join(self.cache_dir, name))
+                except OSError: pass
+
+text_cache = TextCache()
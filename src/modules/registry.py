@@ -0,0 +1,120 @@
+# registry.py
+
+import importlib
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+# Campo "module" de training_data.json -> paquete que lo implementa
+MODULE_PATHS = {
+    "file_reader": "modules.os_control.file_reader",
+    "office_auto": "modules.office_auto.word_session",
+    "os_control": "modules.os_control.system_ops",
+    "web_search": "modules.web_navigator.web_search",
+    "teams_manager": "modules.web_navigator.teams_manager",
+}
+
+# Valor que devuelve un manejador para pedir volver a reposo
+SLEEP = "dormir"
+
+class ModuleRegistry:
+    """
+    Despacho por el campo "modulo" del DTO. Cada módulo se importa la primera
+    vez que se usa (o al calentarlo en segundo plano) y declara en INTENTS
+    las intenciones que atiende con su execute_module(dto, dependencies).
+    Los manejadores internos (saludo, desconocido) se registran con register().
+    Los módulos marcados con isolate() no se importan aquí: se ejecutan en su
+    proceso trabajador (services.workers).
+    """
+    def __init__(self, paths: Dict[str, str] = MODULE_PATHS):
+        self._paths = dict(paths)
+        self._modules: Dict[str, Any] = {}
+        self._handlers: Dict[str, Callable] = {}
+        self._intents: Dict[str, str] = {}
+        self._locks: Dict[str, threading.Lock] = {name: threading.Lock() for name in self._paths}
+        self._isolated = set()
+        self._pool = None
+        self.load_times: Dict[str, float] = {}
+
+    def register(self, name: str, handler: Callable, intents: Iterable[str] = ()):
+        self._handlers[name] = handler
+        for intent in intents: self._intents[intent] = name
+
+    def isolate(self, names: Iterable[str], pool):
+        for name in names:
+            if name in self._paths: self._isolated.add(name)
+            else: print(f"   [MODULOS] '{name}' no es un módulo conocido; sigue en proceso")
+        self._pool = pool
+
+    def isolated(self, name: str) -> bool:
+        return name in self._isolated
+
+    def get(self, name: str):
+        mod = self._modules.get(name)
+        if mod is not None: return mod
+        path = self._paths.get(name)
+        if path is None: return None
+        with self._locks[name]:
+            mod = self._modules.get(name)
+            if mod is None:
+                t0 = time.perf_counter()
+                mod = importlib.import_module(path)
+                self.load_times[name] = time.perf_counter() - t0
+                print(f">>> [MODULOS] {name} cargado en {self.load_times[name]:.2f}s")
+                for intent in getattr(mod, "INTENTS", ()):
+                    self._intents[intent] = name
+                self._modules[name] = mod
+        return mod
+
+    def peek(self, name: str):
+        """El módulo si ya está cargado; nunca lo importa."""
+        return self._modules.get(name)
+
+    def dispatch(self, cmd: Dict, deps: Dict) -> Any:
+        name = cmd.get('modulo')
+        handler = self._handlers.get(name)
+        if handler: return handler(cmd, deps)
+        if name in self._isolated:
+            return self._pool.dispatch(self._paths[name], cmd, deps)
+
+        mod = self.get(name)
+        if mod is None:
+            print(f"   [MODULOS] Sin manejador para '{name}'")
+            return None
+        intent = cmd.get('comando')
+        if intent not in getattr(mod, "INTENTS", (intent,)):
+            print(f"   [MODULOS] {name} no declara la intención '{intent}'")
+        return mod.execute_module(cmd, deps)
+
+    def prewarm(self, name: str):
+        """Importa el módulo en segundo plano y llama a su prewarm() si lo tiene."""
+        if name not in self._paths: return
+        def run():
+            try:
+                if name in self._isolated:
+                    self._pool.prewarm(self._paths[name])
+                    return
+                mod = self.get(name)
+                hook = getattr(mod, "prewarm", None)
+                if hook: hook()
+            except Exception as e:
+                print(f"   [MODULOS] Error pre-calentando {name}: {e}")
+        threading.Thread(target=run, name=f"Warm-{name}", daemon=True).start()
+
+    def warm(self, names: Iterable[str]):
+        for name in names:
+            try:
+                if name in self._isolated: self._pool.start(self._paths[name])
+                else: self.get(name)
+            except Exception as e: print(f"   [MODULOS] Error cargando {name}: {e}")
+
+    def session(self, name: str):
+        """Sesión de dictado activa del módulo, en proceso o en su trabajador; nunca lo importa."""
+        if name in self._isolated: return self._pool.session(self._paths[name])
+        hook = getattr(self.peek(name), "active_session", None)
+        return hook() if hook else None
+
+    def module_for(self, intent: str) -> Optional[str]:
+        return self._intents.get(intent)
+
+registry = ModuleRegistry()
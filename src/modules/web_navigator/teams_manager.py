@@ -12,8 +12,6 @@ import os
 import time
 import keyboard
 import re
-import pyttsx3
-import pythoncom
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
@@ -21,6 +19,8 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.service import Service
 from webdriver_manager.chrome import ChromeDriverManager
+from services.tts import speech_service
+from services.diagnostics import memory_report, process_tree_rss
 
 class TeamsSession:
     def __init__(self):
@@ -29,37 +29,14 @@ class TeamsSession:
         self.download_path = os.path.join(os.path.expanduser("~"), "Downloads")
         self.profile_path = os.path.join(os.path.expanduser("~"), "ChromeProfileLesi")
         self.current_teams = {} 
+        self._driver_path = None
 
     def _speak_interruptible(self, text):
-        was_cancelled = False
-        try:
-            pythoncom.CoInitialize()
-            engine = pyttsx3.init("sapi5")
-            engine.setProperty('rate', 155)
-            voices = engine.getProperty('voices')
-            for v in voices:
-                if "spanish" in v.name.lower():
-                    engine.setProperty('voice', v.id)
-                    break
-
-            def onWord(name, location, length):
-                nonlocal was_cancelled
-                if keyboard.is_pressed('ctrl') or keyboard.is_pressed('esc'):
-                    was_cancelled = True
-                    engine.stop()
-
-            engine.connect('started-word', onWord)
-            
-            clean = text.replace('\n', ' ').strip()
-            if clean:
-                time.sleep(0.5)
-                engine.say(clean)
-                engine.runAndWait()
-        except: pass
-        finally:
-            try: pythoncom.CoUninitialize()
-            except: pass
-        return was_cancelled
+        clean = text.replace('\n', ' ').strip()
+        if not clean: return False
+        handle = speech_service.speak(clean, rate=155,
+                                      interrupt_check=lambda: keyboard.is_pressed('ctrl') or keyboard.is_pressed('esc'))
+        return handle.cancelled
 
     def _speak_local(self, text):
         self._speak_interruptible(text)
@@ -72,10 +49,26 @@ class TeamsSession:
         opts.add_argument("--log-level=3")
         opts.add_argument(f"user-data-dir={self.profile_path}")
         
-        service = Service(ChromeDriverManager().install())
-        self.driver = webdriver.Chrome(service=service, options=opts)
+        self.driver = webdriver.Chrome(service=Service(self._resolve_driver_path()), options=opts)
         return self.driver
 
+    def _resolve_driver_path(self):
+        if not self._driver_path:
+            self._driver_path = ChromeDriverManager().install()
+        return self._driver_path
+
+    def driver_rss(self):
+        driver = self.driver
+        try: return process_tree_rss(driver.service.process.pid) if driver else None
+        except AttributeError: return None
+
+    def prewarm(self):
+        # El navegador de Teams es visible y usa el perfil del usuario: solo se
+        # adelanta la resolución del chromedriver, que es lo que consulta la red.
+        if self.driver: return
+        try: self._resolve_driver_path()
+        except Exception as e: print(f"   [TEAMS] Pre-calentado fallido: {e}")
+
     def check_login(self):
         self._speak_local("Abriendo Teams, espera un momento...")
         driver = self._init_driver()
@@ -397,6 +390,15 @@ class TeamsSession:
         return None
 
 teams_manager = TeamsSession()
+memory_report.register_probe("chrome_teams", teams_manager.driver_rss)
+
+def prewarm():
+    teams_manager.prewarm()
+
+def active_session():
+    return teams_manager if teams_manager.is_active else None
+
+INTENTS = ("abrir_teams", "entrar_equipo", "descargar_archivo_teams", "subir_archivo_teams")
 
 def execute_module(dto, dependencies):
     cmd = dto.get('comando')
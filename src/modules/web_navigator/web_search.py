@@ -4,8 +4,7 @@ import os
 import time
 import requests
 import re
-import pyttsx3
-import pythoncom
+import threading
 import keyboard
 import urllib.parse
 from bs4 import BeautifulSoup
@@ -14,58 +13,79 @@ from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.service import Service
 from webdriver_manager.chrome import ChromeDriverManager
+from services.tts import speech_service, PRIORITY_LOW
+from services.diagnostics import memory_report, process_tree_rss
+
+# Segundos que se conserva un navegador pre-calentado que nadie usó
+WARM_DRIVER_TTL = 60
 
 class WebSession:
     def __init__(self):
         self.current_results = [] 
         self.is_active = False
         self.download_path = os.path.join(os.path.expanduser("~"), "Downloads")
+        self._driver_path = None
+        self._warm_driver = None
+        self._warm_timer = None
+        self._warm_lock = threading.Lock()
 
-    def _speak_local_interruptible(self, text):
-        was_cancelled = False
-        try:
-            pythoncom.CoInitialize()
-            engine = pyttsx3.init("sapi5")
-            engine.setProperty('rate', 155)
-            
-            voices = engine.getProperty('voices')
-            for v in voices:
-                if "spanish" in v.name.lower():
-                    engine.setProperty('voice', v.id)
-                    break
+    def _speak_local_interruptible(self, text, cancel=None):
+        clean = text.replace('\n', ' ').strip()
+        if not clean: return False
 
-            def onWord(name, location, length):
-                nonlocal was_cancelled
-                if keyboard.is_pressed('ctrl'):
-                    was_cancelled = True
-                    engine.stop()
+        print("   [WEB READER] Leyendo... (CTRL para parar)")
+        time.sleep(1)
 
-            engine.connect('started-word', onWord)
+        handle = speech_service.speak(clean, priority=PRIORITY_LOW, rate=155,
+                                      interrupt_check=lambda: keyboard.is_pressed('ctrl') or bool(cancel and cancel.is_set()))
+        return handle.cancelled
 
-            clean = text.replace('\n', ' ').strip()
-            if clean:
-                print("   [WEB READER] Leyendo... (CTRL para parar)")
-                
-                time.sleep(1)
-                
-                engine.say(clean)
-                engine.runAndWait()
-        except Exception as e:
-            print(f"   [TTS ERROR] {e}")
-        finally:
-            try: pythoncom.CoUninitialize()
-            except: pass
-        
-        return was_cancelled
+    def _service(self):
+        # ChromeDriverManager consulta la red: la ruta se resuelve una sola vez
+        if not self._driver_path:
+            self._driver_path = ChromeDriverManager().install()
+        return Service(self._driver_path)
 
-    def _get_driver(self):
+    def _new_driver(self):
         opts = Options()
         opts.add_argument("--headless") 
         opts.add_argument("--disable-gpu")
         opts.add_argument("--log-level=3")
         opts.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36")
-        service = Service(ChromeDriverManager().install())
-        return webdriver.Chrome(service=service, options=opts)
+        return webdriver.Chrome(service=self._service(), options=opts)
+
+    def prewarm(self):
+        """Arranca el navegador headless mientras el usuario aún habla."""
+        with self._warm_lock:
+            if self._warm_driver: return
+            try:
+                print("   [WEB] Pre-calentando navegador...")
+                self._warm_driver = self._new_driver()
+            except Exception as e:
+                print(f"   [WEB] Pre-calentado fallido: {e}")
+                return
+            self._warm_timer = threading.Timer(WARM_DRIVER_TTL, self._discard_warm)
+            self._warm_timer.daemon = True
+            self._warm_timer.start()
+
+    def driver_rss(self):
+        driver = self._warm_driver
+        try: return process_tree_rss(driver.service.process.pid) if driver else None
+        except AttributeError: return None
+
+    def _discard_warm(self):
+        with self._warm_lock:
+            driver, self._warm_driver = self._warm_driver, None
+        if driver:
+            try: driver.quit()
+            except: pass
+
+    def _get_driver(self):
+        # Si hay un pre-calentado en curso se espera a él en vez de abrir otro
+        with self._warm_lock:
+            driver, self._warm_driver = self._warm_driver, None
+            if self._warm_timer: self._warm_timer.cancel()
+        return driver or self._new_driver()
 
     def search_duckduckgo(self, query):
         self.current_results = []
@@ -143,7 +163,7 @@ class WebSession:
             return f"Archivo guardado en Descargas: {filename}"
         except: return "Error en la descarga."
 
-    def _read_web_page(self, url, system_speak):
+    def _read_web_page(self, url, system_speak, cancel=None):
         try:
             final_url = self._resolve_url(url)
             headers = {'User-Agent': 'Mozilla/5.0'}
@@ -178,18 +198,18 @@ class WebSession:
             if not chunks:
                 return "La página no tiene texto legible."
 
-            system_speak("Iniciando lectura. Presione CONTROL o ESCAPE para detener.")
+            system_speak("Iniciando lectura. Diga detener lectura o presione CONTROL para parar.")
             time.sleep(2)
             
             full_text = " ".join(chunks)
-            cancelled = self._speak_local_interruptible(full_text)
+            cancelled = self._speak_local_interruptible(full_text, cancel)
 
             return "Lectura cancelada." if cancelled else "Fin de la página."
 
         except Exception as e:
             return "No pude leer la página."
 
-    def process_selection(self, selection_text, system_speak):
+    def process_selection(self, selection_text, system_speak, cancel=None):
         if not self.current_results:
             return "Primero debes buscar algo."
 
@@ -217,11 +237,17 @@ class WebSession:
                 return self._download_file(url, title)
             else:
                 system_speak(f"Entrando a {title[:20]}...")
-                return self._read_web_page(url, system_speak)
+                return self._read_web_page(url, system_speak, cancel)
         
         return "Opción no válida."
 
 web_session = WebSession()
+memory_report.register_probe("chrome_web", web_session.driver_rss)
+
+def prewarm():
+    web_session.prewarm()
+
+INTENTS = ("investigar_web", "seleccionar_web")
 
 def execute_module(dto, dependencies):
     cmd = dto.get('comando')
@@ -244,8 +270,5 @@ def execute_module(dto, dependencies):
         if not selection:
             main_tts("Dime el número.")
             return
-        msg = web_session.process_selection(selection, main_tts)
-        if msg: main_tts(msg)
-
-    elif cmd == "detener_lectura":
-        main_tts("Presiona CONTROL para detener.")
\ No newline at end of file
+        msg = web_session.process_selection(selection, main_tts, dependencies.get('cancel'))
+        if msg: main_tts(msg)
\ No newline at end of file
@@ -0,0 +1,168 @@
+# audio_capture.py
+
+import threading
+from typing import Callable, Optional
+from services.audio_sources import AudioSource, create_source, SAMPLE_RATE, SAMPLE_WIDTH, FRAME_BYTES
+
+RING_SECONDS = 30
+
+class AudioRing:
+    """
+    Buffer circular de tramas PCM de 16 bits. Un único escritor avanza un
+    contador monótono de bytes escritos; cada lector lleva su propio cursor,
+    así que escribir nunca espera a los lectores. La capacidad es múltiplo de
+    la trama, de modo que una trama nunca queda partida y se entrega como
+    memoryview sobre el propio buffer (sin copias).
+    """
+    def __init__(self, seconds: int = RING_SECONDS, frame_bytes: int = FRAME_BYTES):
+        frames = max(2, (seconds * SAMPLE_RATE * SAMPLE_WIDTH) // frame_bytes)
+        self.frame_bytes = frame_bytes
+        self.capacity = frames * frame_bytes
+        self._buf = bytearray(self.capacity)
+        self._view = memoryview(self._buf)
+        self.written = 0
+        # Solo sirve para despertar a los lectores; los datos no pasan por él
+        self._cond = threading.Condition()
+
+    def write(self, frame):
+        if len(frame) != self.frame_bytes:
+            frame = bytes(frame[:self.frame_bytes]).ljust(self.frame_bytes, b'\0')
+        pos = self.written % self.capacity
+        self._view[pos:pos + self.frame_bytes] = frame
+        with self._cond:
+            self.written += self.frame_bytes
+            self._cond.notify_all()
+
+    def wait_for(self, position: int, timeout: Optional[float]) -> bool:
+        if self.written >= position: return True
+        with self._cond:
+            return self._cond.wait_for(lambda: self.written >= position, timeout)
+
+    def frame_at(self, position: int) -> memoryview:
+        pos = position % self.capacity
+        return self._view[pos:pos + self.frame_bytes]
+
+class RingReader:
+    """Cursor propio sobre el buffer. Si se queda atrás más que la capacidad, salta."""
+    def __init__(self, ring: AudioRing, position: int):
+        self.ring = ring
+        self.position = position
+        self.dropped = 0
+
+    def read(self, timeout: Optional[float] = None) -> Optional[memoryview]:
+        ring = self.ring
+        if not ring.wait_for(self.position + ring.frame_bytes, timeout): return None
+        oldest = ring.written - ring.capacity + ring.frame_bytes
+        if self.position < oldest:
+            self.dropped += (oldest - self.position) // ring.frame_bytes
+            self.position = oldest
+        frame = ring.frame_at(self.position)
+        self.position += ring.frame_bytes
+        # La trama es válida hasta que el escritor dé la vuelta (RING_SECONDS)
+        return frame
+
+    def pending_frames(self) -> int:
+        return max(0, self.ring.written - self.position) // self.ring.frame_bytes
+
+class AudioCapture:
+    """
+    Único hilo dueño del origen de audio (micrófono o WAV): lo abre una vez y
+    escribe tramas en el buffer circular mientras viva el proceso o hasta que
+    el origen se agote. Mientras mute_check()
+    sea verdadero (p. ej. el asistente está hablando) se escriben ceros para
+    no reconocer la propia voz, sin perder la línea de tiempo.
+    """
+    def __init__(self, seconds: int = RING_SECONDS, source: Optional[AudioSource] = None):
+        self.ring = AudioRing(seconds)
+        self.source = source
+        self.mute_check: Optional[Callable[[], bool]] = None
+        self._silence = bytes(FRAME_BYTES)
+        self._thread = None
+        self._running = False
+        self._ready = threading.Event()
+        self.error = None
+
+    def start(self) -> bool:
+        if self._thread and self._thread.is_alive(): return self._ready.wait(5)
+        self._running = True
+        self._ready.clear()
+        self._thread = threading.Thread(target=self._run, name="LesiAudio", daemon=True)
+        self._thread.start()
+        return self._ready.wait(5) and self.error is None
+
+    def _run(self):
+        try:
+            if self.source is None: self.source = create_source()
+            source = self.source
+            source.open()
+            print(f">>> [AUDIO] Captura iniciada ({source.name}).")
+        except Exception as e:
+            self.error = e
+            print(f"Error abriendo el audio: {e}")
+            self._running = False
+            self._ready.set()
+            return
+        self._ready.set()
+
+        try:
+            while self._running:
+                data = source.read()
+                if data is None:
+                    print(">>> [AUDIO] Fin del origen de audio.")
+                    break
+                muted = self.mute_check
+                if muted:
+                    try:
+                        if muted(): data = self._silence
+                    except: pass
+                self.ring.write(data)
+        except Exception as e:
+            self.error = e
+            print(f"Error de captura: {e}")
+        finally:
+            self._running = False
+            source.close()
+            # Despierta a los lectores que esperan tramas que ya no llegarán
+            with self.ring._cond: self.ring._cond.notify_all()
+
+    def reader(self, position: Optional[int] = None, max_backlog: float = 10.0) -> RingReader:
+        """
+        Lector que empieza en position (donde lo dejó el consumidor anterior),
+        sin retroceder más de max_backlog segundos. Sin position, empieza ahora.
+        """
+        now = self.ring.written
+        if position is None: return RingReader(self.ring, now)
+        oldest = now - int(max_backlog * SAMPLE_RATE) * SAMPLE_WIDTH
+        oldest -= oldest % FRAME_BYTES
+        return RingReader(self.ring, min(now, max(position, oldest, 0)))
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def stop(self, timeout: float = 2):
+        self._running = False
+        if self._thread: self._thread.join(timeout)
+
+_vosk_c = None
+
+def accept_frame(rec, frame) -> bool:
+    """
+    AcceptWaveform de Vosk solo acepta bytes; con cffi se le pasa el
+    memoryview directamente y se evita la copia. Si no, se copia la trama.
+    """
+    global _vosk_c
+    if _vosk_c is None:
+        try:
+            from vosk import _c, _ffi
+            _vosk_c = (_c, _ffi)
+        except ImportError:
+            _vosk_c = False
+    if not _vosk_c:
+        return rec.AcceptWaveform(bytes(frame))
+    lib, ffi = _vosk_c
+    res = lib.vosk_recognizer_accept_waveform(rec._handle, ffi.from_buffer(frame), len(frame))
+    if res < 0: raise Exception("Failed to process waveform")
+    return res != 0
+
+audio_capture = AudioCapture()
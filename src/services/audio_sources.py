@@ -0,0 +1,118 @@
+# audio_sources.py
+
+import os
+import time
+import wave
+from typing import Iterator, Optional
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+FRAME_SAMPLES = 1024
+FRAME_BYTES = FRAME_SAMPLES * SAMPLE_WIDTH
+
+class AudioSource:
+    """
+    Origen de audio PCM 16 bits mono a 16 kHz. open() prepara el origen,
+    read() devuelve una trama de FRAME_BYTES (o None al terminar) y close()
+    libera recursos.
+    """
+    name = "base"
+
+    def open(self): pass
+
+    def read(self) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def close(self): pass
+
+    def frames(self) -> Iterator[bytes]:
+        self.open()
+        try:
+            while True:
+                frame = self.read()
+                if frame is None: return
+                yield frame
+        finally:
+            self.close()
+
+class MicrophoneSource(AudioSource):
+    name = "mic"
+
+    def __init__(self, device_index: Optional[int] = None):
+        self.device_index = device_index
+        self._pa = None
+        self._stream = None
+
+    def open(self):
+        import pyaudio
+        self._pa = pyaudio.PyAudio()
+        try:
+            self._stream = self._pa.open(format=pyaudio.paInt16, channels=1, rate=SAMPLE_RATE, input=True,
+                                         frames_per_buffer=FRAME_SAMPLES, input_device_index=self.device_index)
+        except Exception:
+            self._pa.terminate()
+            self._pa = None
+            raise
+
+    def read(self) -> Optional[bytes]:
+        return self._stream.read(FRAME_SAMPLES, exception_on_overflow=False)
+
+    def close(self):
+        try:
+            self._stream.stop_stream()
+            self._stream.close()
+        except: pass
+        if self._pa: self._pa.terminate()
+        self._pa = self._stream = None
+
+class MemorySource(AudioSource):
+    """PCM ya cargado en memoria. realtime=True reproduce al ritmo del micrófono."""
+    name = "memory"
+
+    def __init__(self, pcm: bytes, realtime: bool = False):
+        self.pcm = pcm
+        self.realtime = realtime
+        self._pos = 0
+        self._t0 = 0.0
+
+    def open(self):
+        self._pos = 0
+        self._t0 = time.perf_counter()
+
+    def _pace(self, offset):
+        due = self._t0 + offset / (SAMPLE_RATE * SAMPLE_WIDTH)
+        delay = due - time.perf_counter()
+        if delay > 0: time.sleep(delay)
+
+    def read(self) -> Optional[bytes]:
+        if self._pos >= len(self.pcm): return None
+        frame = self.pcm[self._pos:self._pos + FRAME_BYTES]
+        self._pos += FRAME_BYTES
+        if self.realtime: self._pace(self._pos)
+        return frame.ljust(FRAME_BYTES, b'\0')
+
+    @property
+    def duration(self) -> float:
+        return len(self.pcm) / (SAMPLE_RATE * SAMPLE_WIDTH)
+
+class WavFileSource(MemorySource):
+    """Reproduce un WAV de 16 kHz mono 16 bits (grabaciones de prueba, corpus)."""
+    name = "wav"
+
+    def __init__(self, path: str, realtime: bool = False):
+        self.path = path
+        with wave.open(path, 'rb') as wf:
+            if wf.getnchannels() != 1 or wf.getframerate() != SAMPLE_RATE or wf.getsampwidth() != SAMPLE_WIDTH:
+                raise ValueError(f"{path}: se espera WAV de 16 kHz, mono, 16 bits")
+            pcm = wf.readframes(wf.getnframes())
+        super().__init__(pcm, realtime)
+
+def create_source(kind: Optional[str] = None) -> AudioSource:
+    """
+    LESI_AUDIO_SOURCE elige el origen: "mic" (por defecto) o la ruta de un
+    WAV, que se reproduce en tiempo real como si fuera el micrófono.
+    """
+    kind = kind or os.environ.get("LESI_AUDIO_SOURCE", "mic")
+    if kind == "mic": return MicrophoneSource()
+    if kind.lower().endswith(".wav"): return WavFileSource(kind, realtime=True)
+    raise ValueError(f"Origen de audio desconocido: {kind}")
@@ -0,0 +1,104 @@
+# batch_stt.py
+# Uso: python -m services.batch_stt <carpeta_wav> [procesos] [salida.json]
+# Transcribe sin micrófono todos los WAV de una carpeta (16 kHz mono) repartidos
+# entre procesos; cada proceso carga el modelo Vosk una sola vez.
+
+import os
+import sys
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+if __package__ in (None, ""):
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vosk import Model, KaldiRecognizer, SetLogLevel
+from services.audio_sources import WavFileSource, SAMPLE_RATE
+
+_worker_model = None
+
+def _init_worker(model_path: str):
+    global _worker_model
+    SetLogLevel(-1)
+    _worker_model = Model(model_path)
+
+def transcribe_source(model, source) -> str:
+    rec = KaldiRecognizer(model, SAMPLE_RATE)
+    texts = []
+    for frame in source.frames():
+        if rec.AcceptWaveform(frame):
+            texts.append(json.loads(rec.Result()).get("text", ""))
+    texts.append(json.loads(rec.FinalResult()).get("text", ""))
+    return " ".join(t for t in texts if t)
+
+def transcribe_file(path: str, model=None) -> Dict:
+    """Texto, duración del audio, latencia de decodificación y factor de tiempo real."""
+    model = model or _worker_model
+    try:
+        source = WavFileSource(path)
+    except Exception as e:
+        return {"file": path, "error": str(e)}
+    t0 = time.perf_counter()
+    text = transcribe_source(model, source)
+    latency = time.perf_counter() - t0
+    duration = source.duration
+    return {
+        "file": path,
+        "text": text,
+        "audio_s": round(duration, 3),
+        "latency_s": round(latency, 3),
+        "rtf": round(latency / duration, 4) if duration else None,
+    }
+
+def transcribe_directory(folder: str, workers: Optional[int] = None, model_path: Optional[str] = None) -> Dict:
+    if model_path is None:
+        from services.stt import MODEL_PATH
+        model_path = MODEL_PATH
+    files = sorted(os.path.join(folder, n) for n in os.listdir(folder) if n.lower().endswith(".wav"))
+    workers = max(1, min(workers or (os.cpu_count() or 1), len(files) or 1))
+
+    t0 = time.perf_counter()
+    if workers == 1:
+        _init_worker(model_path)
+        results: List[Dict] = [transcribe_file(f) for f in files]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(model_path,)) as pool:
+            results = list(pool.map(transcribe_file, files))
+    wall = time.perf_counter() - t0
+
+    ok = [r for r in results if "error" not in r]
+    audio = sum(r["audio_s"] for r in ok)
+    return {
+        "files": results,
+        "workers": workers,
+        "audio_s": round(audio, 3),
+        "wall_s": round(wall, 3),
+        # Incluye la carga del modelo en cada proceso
+        "rtf_wall": round(wall / audio, 4) if audio else None,
+        "rtf_decode": round(sum(r["latency_s"] for r in ok) / audio, 4) if audio else None,
+    }
+
+def main():
+    if len(sys.argv) < 2:
+        print("Uso: python -m services.batch_stt <carpeta_wav> [procesos] [salida.json]")
+        return
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    report = transcribe_directory(sys.argv[1], workers)
+
+    for r in report["files"]:
+        name = os.path.basename(r["file"])
+        if "error" in r:
+            print(f"   {name}: ERROR {r['error']}")
+        else:
+            print(f"   {name}: {r['latency_s']:.2f}s para {r['audio_s']:.2f}s (RTF {r['rtf']}) -> '{r['text']}'")
+    print(f"\nArchivos: {len(report['files'])}  procesos: {report['workers']}")
+    print(f"Audio total: {report['audio_s']}s  tiempo real: {report['wall_s']}s")
+    print(f"RTF (pared): {report['rtf_wall']}  RTF (decodificación): {report['rtf_decode']}")
+
+    if len(sys.argv) > 3:
+        with open(sys.argv[3], 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+# diagnostics.py
+
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+MB = 1024 * 1024
+
+def _rss_proc(pid) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"): return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+def _rss_windows() -> Optional[int]:
+    # Solo el proceso actual, sin psutil: GetProcessMemoryInfo de psapi
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return counters.WorkingSetSize
+    except Exception:
+        pass
+    return None
+
+def rss_bytes(pid: Optional[int] = None) -> Optional[int]:
+    """Memoria residente de un proceso (el actual por defecto); None si no se puede medir."""
+    if psutil:
+        try: return psutil.Process(pid or os.getpid()).memory_info().rss
+        except Exception: return None
+    if sys.platform.startswith("linux"): return _rss_proc(pid or "self")
+    if sys.platform == "win32" and pid in (None, os.getpid()): return _rss_windows()
+    return None
+
+def _children_linux(pid: int) -> List[int]:
+    found, pending = [], [pid]
+    parents: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit(): continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            parents.setdefault(ppid, []).append(int(entry))
+        except (OSError, ValueError, IndexError):
+            continue
+    while pending:
+        for child in parents.get(pending.pop(), []):
+            found.append(child)
+            pending.append(child)
+    return found
+
+def process_tree_rss(pid: int) -> Optional[int]:
+    """RSS de un proceso y todos sus hijos (chromedriver + Chrome)."""
+    if psutil:
+        try:
+            root = psutil.Process(pid)
+            total = root.memory_info().rss
+            for child in root.children(recursive=True):
+                try: total += child.memory_info().rss
+                except psutil.Error: pass
+            return total
+        except psutil.Error:
+            return None
+    if sys.platform.startswith("linux"):
+        sizes = [_rss_proc(p) for p in [pid] + _children_linux(pid)]
+        return sum(s for s in sizes if s) or None
+    return None
+
+class MemoryReport:
+    """
+    Memoria atribuida a cada componente. Lo que se carga dentro del proceso
+    (modelo Vosk, modelo de intenciones, documento Word) se mide como
+    incremento de RSS durante su carga con track(); lo que vive en procesos
+    aparte (Chrome) se mide en el momento del informe con sondas.
+    Con el arranque en paralelo los incrementos pueden solaparse: es una
+    atribución aproximada, pensada para vigilar el presupuesto.
+    """
+    def __init__(self, budget_mb: float = 0):
+        self.budget_mb = budget_mb
+        self._loaded: Dict[str, int] = {}
+        self._probes: Dict[str, Callable[[], Optional[int]]] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def track(self, name: str):
+        before = rss_bytes()
+        try:
+            yield
+        finally:
+            after = rss_bytes()
+            if before is not None and after is not None:
+                with self._lock:
+                    self._loaded[name] = self._loaded.get(name, 0) + max(0, after - before)
+
+    def forget(self, name: str):
+        with self._lock: self._loaded.pop(name, None)
+
+    def register_probe(self, name: str, probe: Callable[[], Optional[int]]):
+        self._probes[name] = probe
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        own = rss_bytes()
+        with self._lock: loaded = dict(self._loaded)
+        rows = {name: {"mb": size / MB, "where": "proceso"} for name, size in loaded.items()}
+        external = 0
+        for name, probe in self._probes.items():
+            try: size = probe()
+            except Exception: size = None
+            if size:
+                rows[name] = {"mb": size / MB, "where": "hijos"}
+                external += size
+        if own is not None:
+            rows["resto"] = {"mb": max(0, own - sum(loaded.values())) / MB, "where": "proceso"}
+            rows["total"] = {"mb": (own + external) / MB, "where": "todo"}
+        return rows
+
+    def over_budget(self) -> bool:
+        total = self.snapshot().get("total")
+        return bool(self.budget_mb and total and total["mb"] > self.budget_mb)
+
+    def report(self) -> str:
+        rows = self.snapshot()
+        total = rows.pop("total", None)
+        if total is None: return "Memoria: no disponible (instala psutil)."
+        head = f"Memoria residente: {total['mb']:.1f} MB"
+        if self.budget_mb:
+            head += f" (presupuesto {self.budget_mb:.0f} MB{', EXCEDIDO' if total['mb'] > self.budget_mb else ''})"
+        lines = [head]
+        for name, row in sorted(rows.items(), key=lambda item: item[1]["mb"], reverse=True):
+            suffix = " (procesos hijos)" if row["where"] == "hijos" else ""
+            lines.append(f"   {name:<14} {row['mb']:8.1f} MB{suffix}")
+        return "\n".join(lines)
+
+    def spoken_summary(self) -> str:
+        rows = self.snapshot()
+        total = rows.pop("total", None)
+        if total is None: return "No puedo medir la memoria en este equipo."
+        rows.pop("resto", None)
+        top = sorted(rows.items(), key=lambda item: item[1]["mb"], reverse=True)[:3]
+        text = f"Uso {total['mb']:.0f} megas."
+        if top:
+            text += " Lo que más ocupa: " + ", ".join(f"{name.replace('_', ' ')} {row['mb']:.0f}" for name, row in top) + "."
+        if self.budget_mb and total["mb"] > self.budget_mb:
+            text += f" Estoy por encima del presupuesto de {self.budget_mb:.0f} megas."
+        return text
+
+def _budget_from_config() -> float:
+    try:
+        from config import MEMORY_BUDGET_MB
+        return MEMORY_BUDGET_MB
+    except ImportError:
+        return 0
+
+memory_report = MemoryReport(_budget_from_config())
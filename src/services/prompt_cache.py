@@ -0,0 +1,149 @@
+# prompt_cache.py
+
+import os
+import sys
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+from config import LESI_HOME
+
+# Frases fijas del asistente. Se sintetizan una vez y luego se reproducen desde memoria.
+FIXED_PROMPTS = (
+    "Dime.", "Hasta luego.", "Adiós.", "Hola, estoy aquí.", "No te entendí.",
+    "Dime el número.", "Dime qué buscar.", "Primero debes buscar algo.", "Opción no válida.",
+    "Edición cancelada.", "Edición cancelada por teclado.", "Error al guardar.",
+    "Título.", "Subtítulo.", "Párrafo.", "Punto seguido.", "Escrito.",
+    "Editor listo. Di 'Título', 'Párrafo', 'Oración', 'Dictado' o 'Salir'.",
+    "Nombre de archivo no válido.", "El archivo está vacío.", "Comando no reconocido.",
+    "Lectura cancelada.", "Fin del documento.", "Fin de la página.",
+    "No entendí el nivel.", "Error de conexión.", "No hay ninguna lectura en curso.",
+    "Abriendo Teams, espera un momento...", "Teams cerrado.",
+    "La acción tardó demasiado. La he cancelado.", "El módulo se cerró inesperadamente. Ya lo he reiniciado.",
+)
+
+CacheKey = Tuple[str, str, int]
+# Tope del directorio de WAV; se recorta por LRU (mtime del archivo = último uso)
+MAX_DISK_BYTES = 32 * 1024 * 1024
+
+def default_cache_dir():
+    # Por usuario, como el resto de cachés: _MEIPASS se borra al cerrar el ejecutable
+    return os.path.join(LESI_HOME, "prompts")
+
+class PromptCache:
+    """
+    Caché LRU de audio pre-renderizado indexada por (texto, voz, velocidad).
+    Opcionalmente persiste los WAV en disco para reutilizarlos entre sesiones,
+    en una subcarpeta por (voz, velocidad) y con un tope de tamaño.
+    """
+    def __init__(self, max_bytes: int = 8 * 1024 * 1024, cache_dir: Optional[str] = None,
+                 max_disk_bytes: int = MAX_DISK_BYTES):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._entries: "OrderedDict[CacheKey, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._cacheable = set(FIXED_PROMPTS)
+        self.hits = 0
+        self.misses = 0
+
+    def is_cacheable(self, text: str) -> bool:
+        return text in self._cacheable
+
+    def register(self, text: str):
+        self._cacheable.add(text)
+
+    def _voice_dir(self, voice, rate) -> str:
+        digest = hashlib.sha1(repr((voice, rate)).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.cache_dir, digest)
+
+    def _disk_path(self, key: CacheKey) -> Optional[str]:
+        if not self.cache_dir: return None
+        text, voice, rate = key
+        digest = hashlib.sha1(text.encode('utf-8')).hexdigest()
+        return os.path.join(self._voice_dir(voice, rate), f"{digest}.wav")
+
+    def get(self, key: CacheKey) -> Optional[bytes]:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+
+        path = self._disk_path(key)
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'rb') as f: data = f.read()
+                os.utime(path)
+                self.put(key, data, persist=False)
+                self.hits += 1
+                return data
+            except: pass
+
+        self.misses += 1
+        return None
+
+    def put(self, key: CacheKey, data: bytes, persist: bool = True):
+        if not data or len(data) > self.max_bytes: return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None: self._size -= len(old)
+            self._entries[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+        path = self._disk_path(key)
+        if persist and path:
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'wb') as f: f.write(data)
+            except: return
+            self._evict_disk()
+
+    def _evict_disk(self):
+        entries = []
+        for folder, _, names in os.walk(self.cache_dir):
+            for name in names:
+                if not name.endswith(".wav"): continue
+                full = os.path.join(folder, name)
+                try: st = os.stat(full)
+                except OSError: continue
+                entries.append((st.st_mtime, st.st_size, full))
+
+        total = sum(e[1] for e in entries)
+        for _, size, full in sorted(entries):
+            if total <= self.max_disk_bytes: break
+            try:
+                os.remove(full)
+                total -= size
+            except OSError: pass
+
+    def invalidate(self, keep: Optional[Tuple[str, int]] = None):
+        """
+        Se llama al cambiar voz o velocidad: se descartan de memoria las entradas
+        que no son de keep (voz, velocidad). Las del disco siguen en su carpeta
+        (sirven si se vuelve a esa voz) y las recorta el tope de tamaño.
+        """
+        with self._lock:
+            for key in [k for k in self._entries if k[1:] != keep]:
+                self._size -= len(self._entries.pop(key))
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._size
+
+if __name__ == "__main__":
+    # Pre-renderizado para el usuario actual: python -m services.prompt_cache
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from services.tts import speech_service
+    speech_service.warm_prompts(block=True)
+    print(f">>> [TTS] {len(speech_service.prompt_cache)} frases en caché "
+          f"({speech_service.prompt_cache.size_bytes // 1024} KB).")
+    speech_service.shutdown()
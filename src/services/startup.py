@@ -0,0 +1,85 @@
+# startup.py
+
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+class _Task:
+    def __init__(self, name: str, fn: Callable[[], Any], after: Iterable[str]):
+        self.name = name
+        self.fn = fn
+        self.after = tuple(after)
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.started = None
+        self.finished = None
+
+class StartupOrchestrator:
+    """
+    Arranque en paralelo: cada componente (modelo acústico, modelo de
+    intenciones, voz, módulos) se carga en su propio hilo, respetando las
+    dependencias declaradas con after. El bucle principal espera solo lo
+    que necesita en cada momento con wait(nombre).
+    """
+    def __init__(self):
+        self._tasks: Dict[str, _Task] = {}
+        self.t0 = None
+
+    def add(self, name: str, fn: Callable[[], Any], after: Iterable[str] = ()):
+        self._tasks[name] = _Task(name, fn, after)
+
+    def start(self):
+        self.t0 = time.perf_counter()
+        for task in self._tasks.values():
+            threading.Thread(target=self._run, args=(task,), name=f"Startup-{task.name}", daemon=True).start()
+
+    def _run(self, task: _Task):
+        try:
+            for dep in task.after:
+                self.wait(dep)
+            task.started = time.perf_counter()
+            task.result = task.fn()
+        except BaseException as e:
+            task.error = e
+            print(f">>> [STARTUP] Error cargando {task.name}: {e}")
+        finally:
+            if task.started is None: task.started = time.perf_counter()
+            task.finished = time.perf_counter()
+            task.done.set()
+
+    def wait(self, name: str, timeout: Optional[float] = None) -> Any:
+        """Resultado de la tarea; si falló, se relanza su excepción."""
+        task = self._tasks[name]
+        if not task.done.wait(timeout):
+            raise TimeoutError(f"{name} no terminó en {timeout}s")
+        if task.error: raise task.error
+        return task.result
+
+    def ready(self, name: str) -> bool:
+        task = self._tasks.get(name)
+        return bool(task and task.done.is_set() and not task.error)
+
+    def timeline(self) -> List[Dict[str, Any]]:
+        rows = []
+        for task in self._tasks.values():
+            if task.finished is None:
+                rows.append({"name": task.name, "status": "cargando"})
+                continue
+            rows.append({
+                "name": task.name,
+                "start_s": round(task.started - self.t0, 3),
+                "end_s": round(task.finished - self.t0, 3),
+                "status": "error" if task.error else "ok",
+            })
+        return sorted(rows, key=lambda r: r.get("end_s", float("inf")))
+
+    def report(self) -> str:
+        lines = []
+        for row in self.timeline():
+            if "end_s" not in row:
+                lines.append(f"   {row['name']:<10} cargando...")
+                continue
+            bar = " " * int(row["start_s"] * 10) + "#" * max(1, int((row["end_s"] - row["start_s"]) * 10))
+            lines.append(f"   {row['name']:<10} {row['start_s']:6.2f}s -> {row['end_s']:6.2f}s  {row['status']:<5} {bar}")
+        return "\n".join(lines)
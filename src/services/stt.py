@@ -3,11 +3,23 @@
 import os
 import sys
 import json
+import math
 import time
-import pyaudio
-import winsound
+import threading
 from vosk import Model, KaldiRecognizer, SetLogLevel
-from typing import Optional, Tuple
+from typing import Callable, List, Optional, Tuple
+from services.audio_capture import AudioCapture, audio_capture, accept_frame, SAMPLE_RATE
+from services.audio_sources import FRAME_SAMPLES
+from services.vad import EnergyVAD
+from services.diagnostics import memory_report
+from config import (VAD_ENABLED, WAKE_TRIGGERS, WAKE_MIN_CONFIDENCE, WAKE_USE_GRAMMAR,
+                    ENDPOINT_SILENCE_MS, ENDPOINT_STABLE_MS)
+
+try:
+    import winsound
+except ImportError:
+    # Fuera de Windows no hay sonidos de aviso
+    winsound = None
 
 SetLogLevel(-1)
 
@@ -26,53 +38,191 @@ MODEL_PATH = os.path.join(DATA_DIR, "model")
 SOUND_ON = os.path.join(DATA_DIR, "sounds", "on.wav")
 SOUND_OFF = os.path.join(DATA_DIR, "sounds", "off.wav")
 
+# Hipótesis alternativas que devuelve Kaldi en modo comando
+NBEST_ALTERNATIVES = 5
+# Escala de las puntuaciones del retículo antes del softmax
+ASR_SCORE_SCALE = 1.0
+
+def parse_hypotheses(result_json: str) -> List[Tuple[str, float]]:
+    """[(texto, p_asr)] de un resultado de Vosk, con o sin alternativas, de mejor a peor."""
+    result = json.loads(result_json)
+    alternatives = result.get("alternatives")
+    if alternatives is None:
+        text = result.get("text", "").strip().lower()
+        return [(text, 1.0)] if text else []
+
+    scored = [(a.get("text", "").strip().lower(), float(a.get("confidence", 0.0))) for a in alternatives]
+    scored = [(text, conf) for text, conf in scored if text]
+    if not scored: return []
+    top = max(conf for _, conf in scored)
+    weights = [math.exp((conf - top) * ASR_SCORE_SCALE) for _, conf in scored]
+    total = sum(weights)
+    # Alternativas con el mismo texto (solo cambian los tiempos) se suman
+    merged = {}
+    for (text, _), weight in zip(scored, weights):
+        merged[text] = merged.get(text, 0.0) + weight / total
+    return sorted(merged.items(), key=lambda item: item[1], reverse=True)
+
+def match_trigger(words: List[dict], triggers: List[str], min_conf: float) -> Optional[Tuple[int, float, str]]:
+    """
+    Busca un disparador como secuencia de palabras en el resultado de Vosk
+    (SetWords). Devuelve (índice de su última palabra, confianza media, disparador)
+    del mejor que supere min_conf, o None.
+    """
+    tokens = [w.get("word", "").lower() for w in words]
+    best = None
+    for trigger in triggers:
+        parts = trigger.lower().split()
+        n = len(parts)
+        for i in range(len(tokens) - n + 1):
+            if tokens[i:i + n] != parts: continue
+            conf = sum(float(w.get("conf", 1.0)) for w in words[i:i + n]) / n
+            if conf >= min_conf and (best is None or conf > best[1]):
+                best = (i + n - 1, conf, trigger)
+    return best
+
 class Ear:
-    def __init__(self):
-        print(">>> [STT] Cargando modelo auditivo...")
-        if not os.path.exists(MODEL_PATH):
-            print(f"ERROR: No existe modelo en {MODEL_PATH}")
-            self.model = None
-            return
-        try:
-            self.model = Model(MODEL_PATH)
-            print(">>> [STT] Motor listo.")
-        except Exception as e:
-            print(f"Error al cargar Vosk: {e}")
-            self.model = None
+    """
+    Reconocedor de voz sobre un AudioCapture. El modelo Vosk se carga la
+    primera vez que se necesita (o con load()), no al importar el módulo.
+    """
+    def __init__(self, model_path: str = MODEL_PATH, capture: Optional[AudioCapture] = None,
+                 triggers: Optional[List[str]] = None):
+        self.model_path = model_path
+        self.capture = capture or audio_capture
+        self.triggers = list(triggers or WAKE_TRIGGERS)
+        # Tramas entregadas a cada reconocedor desde su creación (los tiempos de Vosk son acumulados)
+        self._fed = {}
+        # Posición en el buffer de captura donde lo dejó el último modo
+        self._cursor = 0
+        self._recognizers = {}
+        self._model = None
+        self._loaded = False
+        self._load_lock = threading.Lock()
+        self.vad = EnergyVAD() if VAD_ENABLED else None
+        self._energy = EnergyVAD()
+        # Instante (perf_counter) en que terminó la voz del último enunciado devuelto
+        self.last_speech_end = None
+        self.last_endpoint = None
+
+    def load(self):
+        with self._load_lock:
+            if self._loaded: return self._model
+            print(">>> [STT] Cargando modelo auditivo...")
+            if not os.path.exists(self.model_path):
+                print(f"ERROR: No existe modelo en {self.model_path}")
+            else:
+                try:
+                    with memory_report.track("modelo_vosk"):
+                        self._model = Model(self.model_path)
+                    print(">>> [STT] Motor listo.")
+                except Exception as e:
+                    print(f"Error al cargar Vosk: {e}")
+            self._loaded = True
+            return self._model
+
+    @property
+    def model(self):
+        return self._model if self._loaded else self.load()
 
     def _play(self, path):
+        if winsound is None: return
         try:
             if os.path.exists(path):
                 winsound.PlaySound(path, winsound.SND_FILENAME | winsound.SND_ASYNC)
         except: pass
 
+    def _recognizer(self, mode: str):
+        # Un reconocedor por modo, reutilizado entre turnos
+        rec = self._recognizers.get(mode)
+        if rec is None:
+            if mode == "wake" and WAKE_USE_GRAMMAR:
+                grammar = json.dumps(self.triggers + ["[unk]"], ensure_ascii=False)
+                rec = KaldiRecognizer(self.model, SAMPLE_RATE, grammar)
+            else:
+                rec = KaldiRecognizer(self.model, SAMPLE_RATE)
+            if mode == "wake": rec.SetWords(True)
+            if mode == "command": rec.SetMaxAlternatives(NBEST_ALTERNATIVES)
+            self._recognizers[mode] = rec
+            self._fed[mode] = 0
+        else:
+            rec.Reset()
+        return rec
+
+    def _decode_positions(self, positions: List[int]) -> str:
+        """Pasa por el decodificador completo tramas ya capturadas (por posición en el buffer)."""
+        if not positions: return ""
+        rec = self._recognizer("full")
+        ring = self.capture.ring
+        for pos in positions:
+            accept_frame(rec, ring.frame_at(pos))
+        return json.loads(rec.FinalResult()).get("text", "").strip().lower()
+
+    def _frames(self, reader):
+        """
+        Tramas del buffer de captura; None cada segundo sin audio para revisar
+        tiempos. Termina cuando el origen se agota (WAV) y no queda nada pendiente.
+        """
+        while True:
+            frame = reader.read(timeout=1.0)
+            if frame is None and not self.capture.running:
+                if self.capture.error: raise RuntimeError(f"captura detenida ({self.capture.error})")
+                if not reader.pending_frames(): return
+            yield frame
+
     def wait_for_wake_word(self) -> Tuple[bool, str]:
-        if not self.model: return False, ""
+        if not self.model or not self.capture.start(): return False, ""
 
-        p = pyaudio.PyAudio()
-        stream = p.open(format=pyaudio.paInt16, channels=1, rate=16000, input=True, frames_per_buffer=1024)
-        rec = KaldiRecognizer(self.model, 16000)
+        rec = self._recognizer("wake")
+        reader = self.capture.reader(self._cursor)
+        frame_bytes = self.capture.ring.frame_bytes
         
         print("\nMODO REPOSO: Esperando 'Lesi'...")
-        
-        triggers = ["lesi", "le si", "lazy", "lessie", "leci", "lissy", "lessy", 
-                    "le sí", "les y", "decí", "deci", "desir"]
 
-        try:
-            while True:
-                data = stream.read(1024, exception_on_overflow=False)
-                if rec.AcceptWaveform(data):
-                    result = json.loads(rec.Result())
-                    text = result.get("text", "").lower()
+        # Posición en el buffer de cada trama del enunciado en curso, y cuántas
+        # tramas había recibido el reconocedor antes de empezarlo
+        utterance = []
+        base = self._fed["wake"]
 
-                    if not text: continue
+        def check(result_json):
+            nonlocal base
+            words = json.loads(result_json).get("result", [])
+            hit = match_trigger(words, self.triggers, WAKE_MIN_CONFIDENCE)
+            positions = utterance[:]
+            utterance.clear()
+            base = self._fed["wake"]
+            if not hit: return None
 
-                    for trg in triggers:
-                        if trg in text:
-                            self._play(SOUND_ON)
-                            parts = text.split(trg, 1)
-                            remainder = parts[1].strip() if len(parts) > 1 else ""
-                            return True, remainder
+            last, conf, trigger = hit
+            self._play(SOUND_ON)
+            print(f"   [STT] Disparador '{trigger}' ({conf:.2f})")
+            if last == len(words) - 1: return ""
+            # Siguió hablando: el resto del audio va al decodificador completo
+            end_frame = int(float(words[last]["end"]) * SAMPLE_RATE / FRAME_SAMPLES) - (base - len(positions))
+            return self._decode_positions(positions[max(0, end_frame):])
+
+        vad = self.vad
+        if vad: vad.reset()
+
+        try:
+            for frame in self._frames(reader):
+                if frame is None: continue
+                pos = reader.position - frame_bytes
+                # Con la puerta de voz, Kaldi solo decodifica tramas con posible voz
+                gated = vad.process(frame) if vad else (frame,)
+                n = len(gated)
+                for i, f in enumerate(gated):
+                    # El pre-roll son las tramas inmediatamente anteriores
+                    utterance.append(pos - (n - 1 - i) * frame_bytes)
+                    self._fed["wake"] += 1
+                    if accept_frame(rec, f):
+                        remainder = check(rec.Result())
+                        if remainder is not None: return True, remainder
+                if vad and vad.closed_now:
+                    # Fin del tramo de voz: se cierra el enunciado sin esperar al silencio de Kaldi
+                    remainder = check(rec.FinalResult())
+                    if remainder is not None: return True, remainder
+            return False, ""
 
         except KeyboardInterrupt:
             raise KeyboardInterrupt
@@ -80,41 +230,82 @@ class Ear:
             print(f"Error reposo: {e}")
             return False, ""
         finally:
-            stream.stop_stream()
-            stream.close()
-            p.terminate()
+            self._cursor = reader.position
 
-    def listen(self, timeout=120) -> Optional[str]:
-        if not self.model: return None
+    def listen(self, timeout=120, on_partial: Optional[Callable[[str], None]] = None) -> Optional[str]:
+        hypotheses = self.listen_nbest(timeout, on_partial)
+        return hypotheses[0][0] if hypotheses else None
 
-        p = pyaudio.PyAudio()
-        stream = p.open(format=pyaudio.paInt16, channels=1, rate=16000, input=True, frames_per_buffer=1024)
-        rec = KaldiRecognizer(self.model, 16000)
+    def listen_nbest(self, timeout=120, on_partial: Optional[Callable[[str], None]] = None) -> Optional[List[Tuple[str, float]]]:
+        if not self.model or not self.capture.start(): return None
+
+        rec = self._recognizer("command")
+        # Continúa donde terminó el modo anterior: no se pierde lo dicho entre turnos
+        reader = self.capture.reader(self._cursor)
         
         print(f"\nESCUCHANDO... (Cierre tras {timeout}s de silencio)")
-        
-        start_time = time.time()
+
+        # Todo se cuenta en tramas de audio, no en tiempo de reloj
+        ms_per_frame = FRAME_SAMPLES * 1000 / SAMPLE_RATE
+        timeout_frames = int(timeout * 1000 / ms_per_frame)
+        silence_frames = max(1, int(ENDPOINT_SILENCE_MS / ms_per_frame))
+        stable_frames = max(1, int(ENDPOINT_STABLE_MS / ms_per_frame))
+        energy = self._energy
+        energy.reset()
+
+        last_partial = ""
+        trailing = 0        # tramas sin voz desde la última con voz
+        unchanged = 0       # tramas sin cambios en el parcial
+        heard = False
+        speech_end = time.perf_counter()
+
+        def accepted(hypotheses, reason):
+            text = hypotheses[0][0] if hypotheses else ""
+            if len(text) <= 1 or (len(text) <= 2 and text not in ["si", "no", "ok"]):
+                return None
+            self.last_speech_end = speech_end
+            self.last_endpoint = reason
+            print(f"🗣️  '{text}'")
+            return hypotheses
 
         try:
-            while True:
-                elapsed = time.time() - start_time
-                if elapsed > timeout:
-                    print("Tiempo agotado.")
-                    self._play(SOUND_OFF)
-                    return None 
-
-                data = stream.read(1024, exception_on_overflow=False)
-
-                if rec.AcceptWaveform(data):
-                    result = json.loads(rec.Result())
-                    text = result.get("text", "").strip()
-
-                    if len(text) > 1:
-                        if len(text) <= 2 and text not in ["si", "no", "ok"]:
-                            continue
-                        
-                        print(f"🗣️  '{text}'")
-                        return text.lower()
+            for frame in self._frames(reader):
+                if frame is None: continue
+
+                if energy.is_speech(frame):
+                    trailing = 0
+                    speech_end = time.perf_counter()
+                else:
+                    trailing += 1
+                    if trailing > timeout_frames:
+                        print("Tiempo agotado.")
+                        self._play(SOUND_OFF)
+                        return None 
+
+                if accept_frame(rec, frame):
+                    result = accepted(parse_hypotheses(rec.Result()), "kaldi")
+                    if result: return result
+                    last_partial, unchanged, heard = "", 0, False
+                    continue
+
+                partial = json.loads(rec.PartialResult()).get("partial", "")
+                if partial != last_partial:
+                    last_partial = partial
+                    unchanged = 0
+                    if partial:
+                        heard = True
+                        if on_partial: on_partial(partial.lower())
+                else:
+                    unchanged += 1
+
+                # Silencio suficiente y parcial estable: se cierra sin esperar a Kaldi
+                if heard and trailing >= silence_frames and (unchanged >= stable_frames or trailing >= 2 * silence_frames):
+                    result = accepted(parse_hypotheses(rec.FinalResult()), "silencio")
+                    if result: return result
+                    last_partial, unchanged, heard = "", 0, False
+
+            # Origen agotado (WAV): lo que quedaba en el decodificador también cuenta
+            return accepted(parse_hypotheses(rec.FinalResult()), "fin")
 
         except KeyboardInterrupt:
             raise KeyboardInterrupt
@@ -122,9 +313,7 @@ class Ear:
             print(f"Error activo: {e}")
             return None
         finally:
-            stream.stop_stream()
-            stream.close()
-            p.terminate()
+            self._cursor = reader.position
 
 ear_service = Ear()
 
@@ -1,52 +1,412 @@
-import pyttsx3
-from typing import Optional
+# tts.py
 
-engine: Optional[pyttsx3.Engine] = None
+import os
+import sys
+import wave
+import queue
+import tempfile
+import itertools
+import threading
+from typing import Optional, Callable
+from services.prompt_cache import PromptCache, FIXED_PROMPTS, default_cache_dir
 
-def _setup_engine():
-    """Configuración interna del motor con recuperación."""
-    global engine
-    try:
-        engine = pyttsx3.init()
-        engine.setProperty('rate', 150)
-        engine.setProperty('volume', 1.0)
-        
-        voices = engine.getProperty('voices')
-        for v in voices:
-            if "spanish" in v.name.lower() or "español" in v.name.lower():
-                engine.setProperty('voice', v.id)
+DEFAULT_RATE = 150
+DEFAULT_VOLUME = 1.0
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 5
+PRIORITY_LOW = 10
+
+def _is_spanish_voice(voice) -> bool:
+    name = (voice.name or "").lower()
+    return "spanish" in name or "español" in name
+
+class SpeechHandle:
+    """Enunciado encolado: permite esperarlo o cancelarlo desde cualquier hilo."""
+    def __init__(self, text: str, priority: int, rate: Optional[int] = None,
+                 interrupt_check: Optional[Callable[[], bool]] = None, render_only: bool = False):
+        self.text = text
+        self.priority = priority
+        self.rate = rate
+        self.interrupt_check = interrupt_check
+        self.render_only = render_only
+        self.cancelled = False
+        self.completed = False
+        self._done = threading.Event()
+
+    def cancel(self):
+        self.cancelled = True
+
+    def should_stop(self) -> bool:
+        if not self.cancelled and self.interrupt_check:
+            try:
+                if self.interrupt_check(): self.cancelled = True
+            except: pass
+        return self.cancelled
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def _finish(self, completed: bool):
+        self.completed = completed
+        self._done.set()
+
+class NullBackend:
+    """No reproduce nada. Permite ejecutar el asistente sin audio (CI, Linux headless)."""
+    name = "null"
+    can_play = False
+    voice_id = None
+
+    def setup(self): pass
+
+    def configure(self, rate: Optional[int] = None, voice: Optional[str] = None): pass
+
+    def say(self, text: str, should_stop: Callable[[], bool], rate: Optional[int] = None) -> bool:
+        return not should_stop()
+
+    def shutdown(self): pass
+
+class WavFileBackend:
+    """Escribe cada enunciado en un WAV numerado en lugar de reproducirlo."""
+    name = "wav"
+    can_play = True
+
+    def __init__(self, out_dir: str, rate: int = DEFAULT_RATE):
+        self.out_dir = out_dir
+        self.rate = rate
+        self.voice_id = None
+        self._engine = None
+        self._count = 0
+
+    def setup(self):
+        os.makedirs(self.out_dir, exist_ok=True)
+        try:
+            import pyttsx3
+            self._engine = pyttsx3.init()
+            self._engine.setProperty('rate', self.rate)
+        except Exception:
+            self._engine = None
+
+    def configure(self, rate: Optional[int] = None, voice: Optional[str] = None):
+        if rate: self.rate = rate
+        if voice: self.voice_id = voice
+
+    def _write_placeholder(self, path, text, rate):
+        # Sin sintetizador: silencio con la duración estimada (palabras / ppm).
+        seconds = max(0.3, len(text.split()) * 60.0 / float(rate))
+        with wave.open(path, 'wb') as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(16000)
+            wf.writeframes(b"\x00\x00" * int(16000 * seconds))
+
+    def _next_path(self, text):
+        self._count += 1
+        path = os.path.join(self.out_dir, f"{self._count:05d}.wav")
+        with open(os.path.join(self.out_dir, "transcript.txt"), 'a', encoding='utf-8') as f:
+            f.write(f"{os.path.basename(path)}\t{text}\n")
+        return path
+
+    def _synthesize(self, text, path, rate):
+        if self._engine:
+            self._engine.setProperty('rate', rate)
+            self._engine.save_to_file(text, path)
+            self._engine.runAndWait()
+        else:
+            self._write_placeholder(path, text, rate)
+
+    def say(self, text: str, should_stop: Callable[[], bool], rate: Optional[int] = None) -> bool:
+        if should_stop(): return False
+        self._synthesize(text, self._next_path(text), rate or self.rate)
+        return not should_stop()
+
+    def render(self, text: str, rate: Optional[int] = None) -> Optional[bytes]:
+        return _render_with(self._synthesize, text, rate or self.rate)
+
+    def play(self, data: bytes, should_stop: Callable[[], bool], text: str = "") -> bool:
+        if should_stop(): return False
+        with open(self._next_path(text), 'wb') as f: f.write(data)
+        return True
+
+    def shutdown(self):
+        self._engine = None
+
+class Pyttsx3Backend:
+    """Un único motor pyttsx3 (SAPI5 en Windows) vivo durante toda la sesión."""
+    name = "pyttsx3"
+    can_play = sys.platform == "win32"
+
+    def __init__(self, driver: Optional[str] = None, rate: int = DEFAULT_RATE, volume: float = DEFAULT_VOLUME):
+        self.driver = driver
+        self.rate = rate
+        self.volume = volume
+        self.engine = None
+        self.voice_id = None
+        self._current_rate = None
+        self._should_stop: Optional[Callable[[], bool]] = None
+        self._com = False
+
+    def setup(self):
+        if self.driver == "sapi5":
+            import pythoncom
+            pythoncom.CoInitialize()
+            self._com = True
+        import pyttsx3
+        self.engine = pyttsx3.init(self.driver) if self.driver else pyttsx3.init()
+        self.engine.setProperty('volume', self.volume)
+        self._set_rate(self.rate)
+
+        # La voz se resuelve una sola vez
+        for v in self.engine.getProperty('voices'):
+            if _is_spanish_voice(v):
+                self.voice_id = v.id
+                self.engine.setProperty('voice', v.id)
                 break
-    except Exception as e:
-        print(f"Error setup TTS: {e}")
+        self.engine.connect('started-word', self._on_word)
 
-def initialize_tts_engine():
-    global engine
-    if engine is None:
-        _setup_engine()
-        print("INFO: Motor TTS inicializado.")
+    def _set_rate(self, rate):
+        if rate != self._current_rate:
+            self.engine.setProperty('rate', rate)
+            self._current_rate = rate
 
-def speak(text: str) -> bool:
-    global engine
-    
-    if not text: return False
-    
-    if engine is None:
-        _setup_engine()
+    def configure(self, rate: Optional[int] = None, voice: Optional[str] = None):
+        if rate: self.rate = rate
+        if voice:
+            self.voice_id = voice
+            self.engine.setProperty('voice', voice)
+
+    def _on_word(self, name, location, length):
+        if self._should_stop and self._should_stop():
+            self.engine.stop()
 
+    def say(self, text: str, should_stop: Callable[[], bool], rate: Optional[int] = None) -> bool:
+        if should_stop(): return False
+        self._should_stop = should_stop
+        try:
+            self._set_rate(rate or self.rate)
+            self.engine.say(text)
+            self.engine.runAndWait()
+        finally:
+            self._should_stop = None
+        return not should_stop()
+
+    def _synthesize(self, text, path, rate):
+        self._set_rate(rate)
+        self.engine.save_to_file(text, path)
+        self.engine.runAndWait()
+
+    def render(self, text: str, rate: Optional[int] = None) -> Optional[bytes]:
+        return _render_with(self._synthesize, text, rate or self.rate)
+
+    def play(self, data: bytes, should_stop: Callable[[], bool], text: str = "") -> bool:
+        if should_stop(): return False
+        import winsound
+        winsound.PlaySound(data, winsound.SND_MEMORY | winsound.SND_NODEFAULT)
+        return not should_stop()
+
+    def shutdown(self):
+        try:
+            if self.engine: self.engine.stop()
+        except: pass
+        self.engine = None
+        if self._com:
+            try:
+                import pythoncom
+                pythoncom.CoUninitialize()
+            except: pass
+            self._com = False
+
+def _render_with(synthesize, text, rate) -> Optional[bytes]:
+    """Sintetiza a un WAV temporal y devuelve sus bytes."""
+    fd, path = tempfile.mkstemp(suffix=".wav", prefix="lesi_tts_")
+    os.close(fd)
     try:
-        if engine._inLoop:
-            engine.endLoop()
+        synthesize(text, path, rate)
+        with open(path, 'rb') as f: data = f.read()
+        return data or None
+    finally:
+        try: os.remove(path)
+        except: pass
 
-        engine.say(text)
-        engine.runAndWait()
-        return True
-        
-    except Exception as e:
-        print(f"ERROR TTS: {e}")
+def create_backend(kind: Optional[str] = None):
+    """Backend según LESI_TTS_BACKEND (sapi5 | pyttsx3 | wav | null) o la plataforma."""
+    kind = (kind or os.environ.get("LESI_TTS_BACKEND", "")).lower()
+    if kind == "null":
+        return NullBackend()
+    if kind == "wav":
+        out_dir = os.environ.get("LESI_TTS_WAV_DIR", os.path.join(os.getcwd(), "tts_output"))
+        return WavFileBackend(out_dir)
+    if kind == "sapi5" or (not kind and sys.platform == "win32"):
+        return Pyttsx3Backend("sapi5")
+    return Pyttsx3Backend(None)
+
+class SpeechService:
+    """
+    Servicio de voz compartido: un solo motor en un hilo dedicado que consume
+    enunciados de una cola con prioridad. Todos los módulos hablan por aquí.
+    """
+    def __init__(self, backend_factory: Callable = create_backend, prompt_cache: Optional[PromptCache] = None):
+        self._backend_factory = backend_factory
+        self.prompt_cache = prompt_cache or PromptCache(cache_dir=default_cache_dir())
+        self._pending_config = None
+        self._queue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._current: Optional[SpeechHandle] = None
+        self.backend = None
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive(): return
+            self._ready.clear()
+            self._thread = threading.Thread(target=self._run, name="LesiTTS", daemon=True)
+            self._thread.start()
+        self._ready.wait(timeout=15)
+
+    def _setup_backend(self):
+        backend = self._backend_factory()
+        try:
+            backend.setup()
+        except Exception as e:
+            print(f"Error setup TTS ({getattr(backend, 'name', '?')}): {e}. Usando backend nulo.")
+            backend = NullBackend()
+        return backend
+
+    def _run(self):
+        self.backend = self._setup_backend()
+        print("INFO: Motor TTS inicializado.")
+        self._ready.set()
+
+        while True:
+            _, _, handle = self._queue.get()
+            if handle is None: break
+            if handle.should_stop():
+                handle._finish(False)
+                continue
+
+            if self._pending_config:
+                rate, voice = self._pending_config
+                self._pending_config = None
+                self.backend.configure(rate, voice)
+                self.prompt_cache.invalidate(keep=self._cache_key("", None)[1:])
+
+            if handle.render_only:
+                self._render_prompt(handle.text, handle.rate)
+                handle._finish(True)
+                continue
+
+            self._current = handle
+            completed = False
+            try:
+                completed = self._say(handle)
+            except Exception as e:
+                print(f"ERROR TTS: {e}")
+                # Recuperación: se recrea el motor para el siguiente enunciado
+                try: self.backend.shutdown()
+                except: pass
+                self.backend = self._setup_backend()
+            finally:
+                self._current = None
+                handle._finish(completed)
+
+        try: self.backend.shutdown()
+        except: pass
+
+    def _cache_key(self, text, rate):
+        backend = self.backend
+        voice = backend.voice_id or backend.name
+        return (text, voice, rate or getattr(backend, 'rate', DEFAULT_RATE))
+
+    def _render_prompt(self, text, rate):
+        if not self.backend.can_play: return
+        key = self._cache_key(text, rate)
+        if self.prompt_cache.get(key) is not None: return
         try:
-            _setup_engine()
-            engine.say(text)
-            engine.runAndWait()
-            return True
-        except:
-            return False
\ No newline at end of file
+            data = self.backend.render(text, rate)
+            if data: self.prompt_cache.put(key, data)
+        except Exception as e:
+            print(f"   [TTS] No se pudo pre-renderizar '{text}': {e}")
+
+    def _say(self, handle: SpeechHandle) -> bool:
+        backend = self.backend
+        if backend.can_play and self.prompt_cache.is_cacheable(handle.text):
+            data = self.prompt_cache.get(self._cache_key(handle.text, handle.rate))
+            if data is not None:
+                return backend.play(data, handle.should_stop, handle.text)
+            # Primer uso: se dice normalmente y se renderiza en segundo plano
+            self._queue.put((PRIORITY_LOW + 1, next(self._seq),
+                             SpeechHandle(handle.text, PRIORITY_LOW + 1, handle.rate, render_only=True)))
+        return backend.say(handle.text, handle.should_stop, handle.rate)
+
+    def warm_prompts(self, phrases=FIXED_PROMPTS, block: bool = False):
+        """Encola el pre-renderizado de las frases fijas con la menor prioridad."""
+        self.start()
+        handles = []
+        for text in phrases:
+            self.prompt_cache.register(text)
+            handle = SpeechHandle(text, PRIORITY_LOW + 1, render_only=True)
+            self._queue.put((PRIORITY_LOW + 1, next(self._seq), handle))
+            handles.append(handle)
+        if block:
+            for h in handles: h.wait()
+
+    def configure(self, rate: Optional[int] = None, voice: Optional[str] = None):
+        """Cambia voz/velocidad; se aplica antes del siguiente enunciado e invalida la caché."""
+        self._pending_config = (rate, voice)
+
+    def speak(self, text: str, priority: int = PRIORITY_NORMAL, block: bool = True,
+              rate: Optional[int] = None, interrupt_check: Optional[Callable[[], bool]] = None) -> SpeechHandle:
+        handle = SpeechHandle(text, priority, rate, interrupt_check)
+        if not text or not text.strip():
+            handle._finish(False)
+            return handle
+
+        self.start()
+        self._queue.put((priority, next(self._seq), handle))
+        if block: handle.wait()
+        return handle
+
+    def cancel_all(self):
+        """Cancela lo que se está diciendo y vacía la cola (salvo el pre-renderizado)."""
+        keep = []
+        while True:
+            try: item = self._queue.get_nowait()
+            except queue.Empty: break
+            handle = item[2]
+            if handle is None or handle.render_only:
+                keep.append(item)
+                continue
+            handle.cancel()
+            handle._finish(False)
+        for item in keep: self._queue.put(item)
+        current = self._current
+        if current: current.cancel()
+
+    def is_speaking(self) -> bool:
+        return self._current is not None
+
+    def is_reading(self) -> bool:
+        """Lo que suena es contenido (prioridad baja: documento, página web), no un aviso."""
+        current = self._current
+        return current is not None and current.priority >= PRIORITY_LOW
+
+    def shutdown(self, timeout: float = 5):
+        self.cancel_all()
+        if self._thread and self._thread.is_alive():
+            self._queue.put((PRIORITY_HIGH - 1, next(self._seq), None))
+            self._thread.join(timeout)
+        self._thread = None
+
+speech_service = SpeechService()
+
+def initialize_tts_engine():
+    speech_service.start()
+
+def speak(text: str) -> bool:
+    if not text: return False
+    return speech_service.speak(text).completed
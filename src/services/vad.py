@@ -0,0 +1,86 @@
+# vad.py
+
+import collections
+import numpy as np
+from typing import List
+
+# Umbrales por trama de 1024 muestras (64 ms a 16 kHz)
+SPEECH_RATIO = 3.0      # energía sobre el ruido de fondo para considerar voz
+MIN_RMS = 200.0         # por debajo nunca es voz (silencio digital, ruido eléctrico)
+MAX_ZCR = 0.35          # más cruces por cero es siseo/ruido blanco si la energía es modesta
+NOISE_ALPHA = 0.05      # adaptación del ruido de fondo en silencio
+NOISE_ALPHA_SPEECH = 0.005  # adaptación lenta durante voz: un ruido nuevo y constante acaba cerrando la puerta
+HANGOVER_FRAMES = 8     # ~0.5 s abiertos tras la última trama con voz
+PREROLL_FRAMES = 4      # ~0.25 s previos que se reenvían al abrir
+
+class EnergyVAD:
+    """
+    Puerta de actividad de voz por energía RMS y tasa de cruces por cero,
+    con ruido de fondo adaptativo. process(trama) devuelve las tramas que hay
+    que pasar al reconocedor: nada en silencio, el pre-roll más la trama al
+    detectar voz, y la trama tal cual mientras dura la voz y la espera.
+    """
+    def __init__(self, ratio: float = SPEECH_RATIO, min_rms: float = MIN_RMS, max_zcr: float = MAX_ZCR,
+                 hangover: int = HANGOVER_FRAMES, preroll: int = PREROLL_FRAMES):
+        self.ratio = ratio
+        self.min_rms = min_rms
+        self.max_zcr = max_zcr
+        self.hangover = hangover
+        self.noise = min_rms / ratio
+        self._preroll = collections.deque(maxlen=preroll)
+        self._remaining = 0
+        self.active = False
+        # Se pone a True en la trama en que la puerta se cierra
+        self.closed_now = False
+        self.frames_in = 0
+        self.frames_out = 0
+
+    def reset(self):
+        self._preroll.clear()
+        self._remaining = 0
+        self.active = False
+        self.closed_now = False
+
+    def is_speech(self, frame) -> bool:
+        samples = np.frombuffer(frame, dtype=np.int16).astype(np.float32)
+        rms = float(np.sqrt(np.mean(samples * samples))) if samples.size else 0.0
+        signs = np.signbit(samples)
+        zcr = float(np.count_nonzero(signs[1:] != signs[:-1])) / max(1, samples.size - 1)
+
+        speech = rms >= self.min_rms and rms >= self.noise * self.ratio
+        if speech and zcr > self.max_zcr and rms < self.noise * self.ratio * 2:
+            speech = False
+        # Las tramas silenciadas (ceros mientras habla Lesi) no cuentan como ruido
+        if rms > 0:
+            self.noise += (NOISE_ALPHA_SPEECH if speech else NOISE_ALPHA) * (rms - self.noise)
+            self.noise = max(self.noise, 1.0)
+        return speech
+
+    def process(self, frame) -> List:
+        self.frames_in += 1
+        self.closed_now = False
+        if self.is_speech(frame):
+            self._remaining = self.hangover
+            if not self.active:
+                self.active = True
+                out = list(self._preroll) + [frame]
+                self._preroll.clear()
+                self.frames_out += len(out)
+                return out
+            self.frames_out += 1
+            return [frame]
+
+        if self.active:
+            self._remaining -= 1
+            if self._remaining <= 0:
+                self.active = False
+                self.closed_now = True
+            self.frames_out += 1
+            return [frame]
+
+        self._preroll.append(frame)
+        return []
+
+    @property
+    def forwarded_ratio(self) -> float:
+        return self.frames_out / self.frames_in if self.frames_in else 0.0
@@ -0,0 +1,368 @@
+# workers.py
+
+import os
+import sys
+import time
+import queue
+import threading
+import importlib
+import subprocess
+import multiprocessing
+from typing import Any, Callable, Dict, Optional
+
+import services.tts as tts
+from services.tts import SpeechHandle, PRIORITY_NORMAL
+from services.diagnostics import memory_report, process_tree_rss
+
+try:
+    from config import WORKER_TIMEOUTS, WORKER_TIMEOUT_DEFAULT
+except ImportError:
+    WORKER_TIMEOUTS, WORKER_TIMEOUT_DEFAULT = {}, 60
+
+# Tras pedir la cancelación, margen para que el módulo termine por su cuenta
+CANCEL_GRACE_S = 5.0
+# Solo viajan de vuelta resultados simples (lo habitual es None o un mensaje)
+_PLAIN = (type(None), bool, int, float, str)
+
+class WorkerError(RuntimeError):
+    pass
+
+class WorkerTimeout(WorkerError):
+    pass
+
+class WorkerCrashed(WorkerError):
+    pass
+
+def _key_cancel() -> bool:
+    try:
+        import keyboard
+        return keyboard.is_pressed('ctrl') or keyboard.is_pressed('esc')
+    except Exception:
+        return False
+
+def _kill_tree(pid: int):
+    """Mata el trabajador y lo que haya lanzado (chromedriver, Chrome, Word)."""
+    try:
+        import psutil
+        root = psutil.Process(pid)
+        for child in root.children(recursive=True):
+            try: child.kill()
+            except psutil.Error: pass
+        root.kill()
+        return
+    except ImportError:
+        pass
+    except Exception:
+        return
+    if sys.platform == "win32":
+        subprocess.run(["taskkill", "/T", "/F", "/PID", str(pid)], capture_output=True)
+
+# --- Lado trabajador ---
+
+_in_worker = False
+
+class _WorkerLink:
+    """Conexión del trabajador con el principal; un hilo lee mientras corre la tarea."""
+    def __init__(self, conn):
+        self.conn = conn
+        self.jobs = queue.Queue()
+        self.replies = queue.Queue()
+        self.cancel = threading.Event()
+        self.job_id = None
+        self.cancelled_job = None
+        threading.Thread(target=self._read, name="LesiWorkerLink", daemon=True).start()
+
+    def _read(self):
+        while True:
+            try:
+                msg = self.conn.recv()
+            except (EOFError, OSError):
+                os._exit(0)  # el principal ya no está
+            kind = msg[0]
+            if kind == "run":
+                self.jobs.put(msg[1:])
+            elif kind == "cancel":
+                self.cancelled_job = msg[1]
+                if self.job_id == msg[1]: self.cancel.set()
+            elif kind == "spoken":
+                self.replies.put(msg[1])
+            elif kind == "stop":
+                self.jobs.put(None)
+                return
+
+    def speak(self, text, priority, rate, interruptible) -> bool:
+        self.conn.send(("speak", self.job_id, text, priority, rate, interruptible))
+        return self.replies.get()
+
+class RemoteSpeech:
+    """
+    speech_service dentro del trabajador: cada enunciado lo dice el proceso
+    principal y se espera a que acabe. Si el módulo pasa interrupt_check, el
+    principal lo sustituye por la cancelación de la acción y el teclado.
+    """
+    def __init__(self, link: _WorkerLink):
+        self._link = link
+
+    def speak(self, text: str, priority: int = PRIORITY_NORMAL, block: bool = True,
+              rate: Optional[int] = None, interrupt_check: Optional[Callable[[], bool]] = None) -> SpeechHandle:
+        handle = SpeechHandle(text, priority, rate, interrupt_check)
+        if not text or not text.strip():
+            handle._finish(False)
+            return handle
+        if self._link.speak(text, priority, rate, interrupt_check is not None): handle.cancel()
+        handle._finish(not handle.cancelled)
+        return handle
+
+    def start(self): pass
+    def warm_prompts(self, *args, **kwargs): pass
+    def configure(self, *args, **kwargs): pass
+    def cancel_all(self): pass
+    def is_speaking(self) -> bool: return False
+
+def _run_job(mod, kind, payload, link: _WorkerLink):
+    if kind == "intent":
+        deps = {"tts": lambda text: tts.speech_service.speak(text) if text else None,
+                "stt": None, "cancel": link.cancel}
+        return mod.execute_module(payload, deps)
+    if kind == "dictado":
+        session = mod.active_session()
+        return session.process_dictation(payload) if session else None
+    if kind == "prewarm":
+        hook = getattr(mod, "prewarm", None)
+        return hook() if hook else None
+    if kind == "call":
+        func, args = payload
+        return getattr(mod, func)(*args)
+    raise ValueError(f"Tarea desconocida: {kind}")
+
+def _worker_main(conn, module_path: str):
+    global _in_worker
+    _in_worker = True
+    link = _WorkerLink(conn)
+    # Antes de importar el módulo: su "from services.tts import speech_service" recibe el remoto
+    tts.speech_service = RemoteSpeech(link)
+    try:
+        mod = importlib.import_module(module_path)
+    except Exception as e:
+        conn.send(("failed", f"{type(e).__name__}: {e}"))
+        return
+    conn.send(("ready", os.getpid()))
+
+    while True:
+        job = link.jobs.get()
+        if job is None: break
+        job_id, kind, payload = job
+        link.job_id = job_id
+        link.cancel.clear()
+        if link.cancelled_job == job_id: link.cancel.set()
+        try:
+            ok, result = True, _run_job(mod, kind, payload, link)
+        except Exception as e:
+            ok, result = False, f"{type(e).__name__}: {e}"
+        if not isinstance(result, _PLAIN): result = None
+        hook = getattr(mod, "active_session", None)
+        conn.send(("done", job_id, ok, result, bool(hook and hook())))
+        link.job_id = None
+
+# --- Lado principal ---
+
+class WorkerProcess:
+    """
+    Un módulo pesado en su propio proceso, supervisado desde el principal:
+    una tarea a la vez, con límite de tiempo; si se cuelga o se cae, se mata
+    su árbol de procesos y se lanza uno nuevo.
+    """
+    def __init__(self, module_path: str):
+        self.module_path = module_path
+        self.name = module_path.rsplit(".", 1)[-1]
+        self.process = None
+        self.conn = None
+        self.session_active = False
+        self.restarts = 0
+        self._job_id = 0
+        self._lock = threading.Lock()
+        memory_report.register_probe(f"proc_{self.name}", self.rss)
+
+    def alive(self) -> bool:
+        return bool(self.process and self.process.is_alive())
+
+    def start(self):
+        if self.alive(): return
+        ctx = multiprocessing.get_context("spawn")
+        parent_conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn, self.module_path),
+                                   name=f"LesiWorker-{self.name}", daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+        self.session_active = False
+        print(f">>> [TRABAJADORES] {self.name} iniciado (pid {self.process.pid})")
+
+    def rss(self) -> Optional[int]:
+        process = self.process
+        return process_tree_rss(process.pid) if process and process.is_alive() else None
+
+    def kill(self):
+        process, conn = self.process, self.conn
+        self.process = self.conn = None
+        self.session_active = False
+        if process is None: return
+        if process.is_alive():
+            _kill_tree(process.pid)
+            process.kill()
+            process.join(2)
+        try: conn.close()
+        except Exception: pass
+
+    def stop(self, timeout: float = 3):
+        if self.alive():
+            try: self.conn.send(("stop",))
+            except Exception: pass
+            self.process.join(timeout)
+        self.kill()
+
+    def _restart(self, reason: str):
+        print(f">>> [TRABAJADORES] {self.name}: {reason}; reiniciando")
+        self.kill()
+        self.restarts += 1
+        self.start()
+
+    def _speak(self, msg, cancel) -> bool:
+        _, _, text, priority, rate, interruptible = msg
+        check = None
+        if interruptible:
+            check = lambda: bool(cancel and cancel.is_set()) or _key_cancel()
+        print(f"   [{self.name.upper()}] {text}")
+        return tts.speech_service.speak(text, priority, rate=rate, interrupt_check=check).cancelled
+
+    def run(self, kind: str, payload: Any, timeout: float,
+            cancel: Optional[threading.Event] = None, blocking: bool = True) -> Any:
+        """
+        Ejecuta una tarea y devuelve su resultado. El tiempo que se pasa
+        hablando por cuenta del módulo no cuenta para el límite.
+        """
+        if not self._lock.acquire(blocking): return None
+        try:
+            self.start()
+            self._job_id += 1
+            job_id = self._job_id
+            try:
+                self.conn.send(("run", job_id, kind, payload))
+            except (OSError, ValueError):
+                self._restart("conexión perdida")
+                raise WorkerCrashed(self.name)
+
+            deadline = time.monotonic() + timeout
+            cancel_sent = False
+            while True:
+                if cancel is not None and cancel.is_set() and not cancel_sent:
+                    self.conn.send(("cancel", job_id))
+                    cancel_sent = True
+                    deadline = min(deadline, time.monotonic() + CANCEL_GRACE_S)
+                try:
+                    ready = self.conn.poll(0.1)
+                except (EOFError, OSError):
+                    ready = True
+                if not ready:
+                    if not self.process.is_alive():
+                        self._restart(f"terminó con código {self.process.exitcode}")
+                        raise WorkerCrashed(self.name)
+                    if time.monotonic() > deadline:
+                        if cancel_sent:
+                            self._restart("no atendió la cancelación")
+                            return None
+                        self._restart(f"sin respuesta tras {timeout:.0f}s ({kind})")
+                        raise WorkerTimeout(self.name)
+                    continue
+
+                try:
+                    msg = self.conn.recv()
+                except (EOFError, OSError):
+                    self._restart("conexión perdida")
+                    raise WorkerCrashed(self.name)
+
+                if msg[0] == "speak":
+                    t0 = time.monotonic()
+                    cancelled = self._speak(msg, cancel)
+                    deadline += time.monotonic() - t0
+                    self.conn.send(("spoken", cancelled))
+                elif msg[0] == "ready":
+                    # La importación del módulo no cuenta para el límite de la tarea
+                    deadline = max(deadline, time.monotonic() + timeout)
+                elif msg[0] == "failed":
+                    self.kill()
+                    raise WorkerError(f"{self.name} no se pudo cargar: {msg[1]}")
+                elif msg[0] == "done" and msg[1] == job_id:
+                    _, _, ok, result, session = msg
+                    self.session_active = session
+                    if not ok: raise WorkerError(result)
+                    return result
+        finally:
+            self._lock.release()
+
+class RemoteSession:
+    """Sesión de dictado que vive en un trabajador (Teams)."""
+    is_active = True
+
+    def __init__(self, pool: "WorkerPool", module_path: str):
+        self._pool = pool
+        self._path = module_path
+
+    def process_dictation(self, text: str):
+        return self._pool.dictation(self._path, text)
+
+class WorkerPool:
+    """Un WorkerProcess por módulo, creado al primer uso."""
+    def __init__(self):
+        self._workers: Dict[str, WorkerProcess] = {}
+        self._lock = threading.Lock()
+
+    def worker(self, module_path: str) -> WorkerProcess:
+        with self._lock:
+            w = self._workers.get(module_path)
+            if w is None:
+                w = self._workers[module_path] = WorkerProcess(module_path)
+            return w
+
+    def timeout_for(self, key: str) -> float:
+        return WORKER_TIMEOUTS.get(key, WORKER_TIMEOUT_DEFAULT)
+
+    def start(self, module_path: str):
+        self.worker(module_path).start()
+
+    def _guarded(self, module_path: str, kind: str, payload: Any, key: str,
+                 speak: Optional[Callable[[str], None]] = None, cancel=None) -> Any:
+        speak = speak or (lambda text: tts.speech_service.speak(text))
+        try:
+            return self.worker(module_path).run(kind, payload, self.timeout_for(key), cancel)
+        except WorkerTimeout:
+            speak("La acción tardó demasiado. La he cancelado.")
+        except WorkerCrashed:
+            speak("El módulo se cerró inesperadamente. Ya lo he reiniciado.")
+        return None
+
+    def dispatch(self, module_path: str, cmd: Dict, deps: Dict) -> Any:
+        return self._guarded(module_path, "intent", cmd, cmd.get('comando'), deps.get('tts'), deps.get('cancel'))
+
+    def dictation(self, module_path: str, text: str) -> Any:
+        return self._guarded(module_path, "dictado", text, "dictado")
+
+    def prewarm(self, module_path: str):
+        # Si ya hay una tarea en curso no hace falta calentar nada
+        self.worker(module_path).run("prewarm", None, self.timeout_for("prewarm"), blocking=False)
+
+    def call(self, module_path: str, func: str, *args, timeout: Optional[float] = None) -> Any:
+        """Llama a una función del módulo en su trabajador (dentro de un trabajador, directamente)."""
+        if _in_worker:
+            return getattr(importlib.import_module(module_path), func)(*args)
+        return self.worker(module_path).run("call", (func, args), timeout or self.timeout_for(func))
+
+    def session(self, module_path: str) -> Optional[RemoteSession]:
+        w = self._workers.get(module_path)
+        return RemoteSession(self, module_path) if w and w.alive() and w.session_active else None
+
+    def shutdown(self):
+        for w in list(self._workers.values()):
+            w.stop()
+
+worker_pool = WorkerPool()
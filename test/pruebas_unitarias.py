@@ -0,0 +1,439 @@
+# pruebas_unitarias.py
+# Uso: python test/pruebas_unitarias.py
+
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(root_dir, "src"))
+
+import core.pln as pln
+from core.fastpath import PatternFastPath, HIT
+
+# Frases que un patrón de una sola palabra literal ("subir {file_name}",
+# "la {selection}", "ir a {team_name}") capturaba con confianza 1.0
+FALSOS_POSITIVOS = {
+    "subir el volumen": "subir_archivo_teams",
+    "bajar el volumen": "descargar_archivo_teams",
+    "la hora": "seleccionar_web",
+    "la verdad no se": "seleccionar_web",
+    "ir a youtube": "entrar_equipo",
+    "entrar a facebook": "entrar_equipo",
+}
+
+class PruebasViaRapida(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # El modelo se entrena en una carpeta temporal a partir del training_data.json del repositorio
+        cls.tmp = tempfile.mkdtemp(prefix="lesi_pln_")
+        shutil.copy(pln.TRAINING_DATA_PATH, cls.tmp)
+        cls.paths = (pln.DATA_DIR, pln.MODEL_PATH, pln.COMPACT_MODEL_PATH, pln.TRAINING_DATA_PATH)
+        pln.DATA_DIR = cls.tmp
+        pln.MODEL_PATH = os.path.join(cls.tmp, "intent_classifier.pkl")
+        pln.COMPACT_MODEL_PATH = os.path.join(cls.tmp, "intent_model.npz")
+        pln.TRAINING_DATA_PATH = os.path.join(cls.tmp, "training_data.json")
+        assert pln.initialize_pln_model()
+
+    @classmethod
+    def tearDownClass(cls):
+        pln.DATA_DIR, pln.MODEL_PATH, pln.COMPACT_MODEL_PATH, pln.TRAINING_DATA_PATH = cls.paths
+        shutil.rmtree(cls.tmp, ignore_errors=True)
+
+    def test_patrones_de_una_palabra_no_resuelven(self):
+        fast_path = PatternFastPath(pln.intent_config_cache)
+        for texto, incorrecta in FALSOS_POSITIVOS.items():
+            status, intent, _ = fast_path.match(texto)
+            self.assertFalse(status == HIT and intent == incorrecta, texto)
+
+    def test_falsos_positivos_no_llegan_al_modulo(self):
+        for texto, incorrecta in FALSOS_POSITIVOS.items():
+            dto = pln.process_command(texto)[0]
+            self.assertNotEqual(dto["comando"], incorrecta, texto)
+
+    def test_volumen_sigue_siendo_volumen(self):
+        for texto in ("subir el volumen", "bajar el volumen"):
+            self.assertEqual(pln.process_command(texto)[0]["comando"], "ajustar_volumen")
+
+    def test_via_rapida_no_llama_al_clasificador(self):
+        classifier = pln._active_model[0]
+        with mock.patch.object(classifier, "predict_proba", side_effect=AssertionError("clasificador llamado")):
+            dto = pln.process_command("pon el volumen al máximo")[0]
+        self.assertEqual(dto["comando"], "ajustar_volumen")
+        self.assertEqual(dto["variables"].get("level"), "máximo")
+        self.assertEqual(dto["confianza"], 1.0)
+
+    def test_patron_de_una_palabra_con_variable_numerica(self):
+        for texto, nivel in (("nivel 30", "30"), ("nivel treinta", "treinta")):
+            dto = pln.process_command(texto)[0]
+            self.assertEqual(dto["comando"], "ajustar_volumen", texto)
+            self.assertEqual(dto["variables"].get("level"), nivel, texto)
+        status, _, _ = PatternFastPath(pln.intent_config_cache).match("nivel alto")
+        self.assertNotEqual(status, HIT)
+
+    def test_parciales_no_cuentan_en_la_estadistica(self):
+        antes = pln.fastpath_stats()["total"]
+        nlu = pln.IncrementalNLU()
+        for parcial in ("nivel", "nivel 3", "nivel 30"):
+            nlu.feed_partial(parcial)
+        nlu.finalize("nivel 30")
+        self.assertEqual(pln.fastpath_stats()["total"], antes + 1)
+
+class PruebasModeloCompacto(unittest.TestCase):
+    def test_mismas_predicciones_que_sklearn(self):
+        import json
+        import warnings
+        import joblib
+        from core.compact_model import CompactIntentModel
+        tmp = tempfile.mkdtemp(prefix="lesi_modelo_")
+        self.addCleanup(shutil.rmtree, tmp, True)
+        for name, value in (("DATA_DIR", tmp), ("MODEL_PATH", os.path.join(tmp, "intent_classifier.pkl")),
+                            ("COMPACT_MODEL_PATH", os.path.join(tmp, "intent_model.npz"))):
+            patcher = mock.patch.object(pln, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        with open(pln.TRAINING_DATA_PATH, encoding="utf-8") as f:
+            intents = json.load(f)["intents"]
+        texts = [ex for obj in intents for ex in obj.get("examples", [])]
+        labels = [obj["name"] for obj in intents for _ in obj.get("examples", [])]
+        with warnings.catch_warnings():
+            # Un parámetro obsoleto de sklearn rompería el entrenamiento en la próxima versión
+            warnings.simplefilter("error", FutureWarning)
+            compact = pln._fit_and_export(texts, labels, "prueba")
+        pipeline = joblib.load(pln.MODEL_PATH)
+
+        frases = texts + ["subir el volumen", "la hora", "nivel 30", "abre el documento informe anual", "zzz"]
+        self.assertEqual(list(compact.predict(frases)), list(pipeline.predict(frases)))
+        diferencia = abs(compact.predict_proba(frases) - pipeline.predict_proba(frases)).max()
+        self.assertLess(diferencia, 1e-9)
+        self.assertEqual(CompactIntentModel.load(pln.COMPACT_MODEL_PATH).stamp, "prueba")
+
+class _VozFalsa:
+    """Registra lo que se lee; al llegar a cancelar_en, activa el evento de cancelación."""
+    def __init__(self, cancel=None, cancelar_en=None):
+        self.leido = []
+        self.cancel = cancel
+        self.cancelar_en = cancelar_en
+
+    def speak(self, text, priority=None, interrupt_check=None, **kwargs):
+        self.leido.append(text)
+        if self.cancel is not None and len(self.leido) == self.cancelar_en: self.cancel.set()
+        return mock.Mock(cancelled=False)
+
+class PruebasLecturaReanudable(unittest.TestCase):
+    def setUp(self):
+        import modules.os_control.file_reader as lector
+        self.lector = lector
+        self.dir = tempfile.mkdtemp(prefix="lesi_lectura_")
+        self.addCleanup(shutil.rmtree, self.dir, True)
+        for name, value in (("POSITIONS_PATH", os.path.join(self.dir, "read_positions.json")),
+                            ("_key_cancel", lambda: False)):
+            patcher = mock.patch.object(lector, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        # Una oración por fragmento (cada una pasa de la mitad de CHUNK_MAX_CHARS)
+        self.frases = [f"Frase {i} " + "palabra " * 30 + "final." for i in range(5)]
+        self.ruta = os.path.join(self.dir, "informe.txt")
+        with open(self.ruta, "w", encoding="utf-8") as f:
+            f.write(" ".join(self.frases))
+
+    def _leer(self, voz, inicio=0):
+        avisos = []
+        cancel = voz.cancel or threading.Event()
+        with mock.patch.object(self.lector, "speech_service", voz):
+            self.lector.read_document(self.ruta, avisos.append, inicio, cancel=cancel)
+        return avisos
+
+    def test_cancelar_guarda_y_reanuda(self):
+        voz = _VozFalsa(threading.Event(), cancelar_en=3)
+        avisos = self._leer(voz)
+        self.assertEqual(avisos[-1], "Lectura cancelada.")
+        self.assertEqual(self.lector.get_resume_position(self.ruta), 2)
+        self.assertEqual(self.lector._load_positions()["last"], os.path.abspath(self.ruta))
+
+        voz = _VozFalsa()
+        avisos = self._leer(voz, self.lector.get_resume_position(self.ruta))
+        self.assertEqual(voz.leido, self.frases[2:])
+        self.assertTrue(avisos[0].startswith("Continuando informe.txt"))
+        self.assertEqual(avisos[-1], "Fin del documento.")
+        # Leído hasta el final: no queda nada pendiente
+        self.assertEqual(self.lector.get_resume_position(self.ruta), 0)
+        self.assertIsNone(self.lector._load_positions()["last"])
+
+    def test_archivo_modificado_empieza_de_cero(self):
+        self.lector._remember_position(self.ruta, 3)
+        self.assertEqual(self.lector.get_resume_position(self.ruta), 3)
+        with open(self.ruta, "a", encoding="utf-8") as f:
+            f.write(" Otra frase.")
+        self.assertEqual(self.lector.get_resume_position(self.ruta), 0)
+
+class PruebasCacheTexto(unittest.TestCase):
+    def setUp(self):
+        from modules.os_control.text_cache import TextCache
+        self.dir = tempfile.mkdtemp(prefix="lesi_texto_")
+        self.addCleanup(shutil.rmtree, self.dir, True)
+        self.cache = TextCache(cache_dir=os.path.join(self.dir, "cache"))
+        self.ruta = os.path.join(self.dir, "informe.pdf")
+        with open(self.ruta, "wb") as f: f.write(b"contenido")
+
+    def test_acierto_con_el_mismo_archivo(self):
+        self.assertIsNone(self.cache.get(self.ruta))
+        self.cache.put(self.ruta, ["página uno", "página dos"])
+        self.assertEqual(self.cache.get(self.ruta), ["página uno", "página dos"])
+
+    def test_fallo_si_cambia_el_tamano(self):
+        self.cache.put(self.ruta, ["página uno"])
+        with open(self.ruta, "ab") as f: f.write(b" y mas")
+        self.assertIsNone(self.cache.get(self.ruta))
+
+    def test_fallo_si_cambia_el_mtime(self):
+        self.cache.put(self.ruta, ["página uno"])
+        st = os.stat(self.ruta)
+        os.utime(self.ruta, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+        self.assertIsNone(self.cache.get(self.ruta))
+
+    def test_recorte_por_lru(self):
+        otra = os.path.join(self.dir, "acta.pdf")
+        with open(otra, "wb") as f: f.write(b"otro")
+        self.cache.put(self.ruta, ["x" * 2000])
+        # Cabe una sola entrada: al guardar la segunda se borra la menos usada
+        self.cache.max_bytes = os.path.getsize(self.cache._entry_path(self.ruta)) + 1
+        os.utime(self.cache._entry_path(self.ruta), (1, 1))
+        self.cache.put(otra, ["y" * 2000])
+        self.assertIsNone(self.cache.get(self.ruta))
+        self.assertEqual(self.cache.get(otra), ["y" * 2000])
+
+class PruebasBufferAudio(unittest.TestCase):
+    def test_vuelta_del_buffer(self):
+        from services.audio_capture import AudioRing, RingReader
+        ring = AudioRing(seconds=1, frame_bytes=8000)
+        self.assertEqual(ring.capacity, 4 * 8000)
+        lector = RingReader(ring, 0)
+        for i in range(6):
+            ring.write(bytes([i]) * 8000)
+        # Quedan las últimas tramas; la más vieja puede estar sobrescribiéndose y se salta
+        tramas = [lector.read(timeout=0) for _ in range(3)]
+        self.assertEqual([bytes(t[:1]) for t in tramas], [b"\x03", b"\x04", b"\x05"])
+        self.assertEqual(lector.dropped, 3)
+        self.assertIsNone(lector.read(timeout=0))
+        ring.write(b"\x06" * 8000)
+        self.assertEqual(bytes(lector.read(timeout=0)[:1]), b"\x06")
+
+    def test_trama_corta_se_rellena(self):
+        from services.audio_capture import AudioRing, RingReader
+        ring = AudioRing(seconds=1, frame_bytes=8000)
+        lector = RingReader(ring, 0)
+        ring.write(b"\x01" * 10)
+        trama = lector.read(timeout=0)
+        self.assertEqual(len(trama), 8000)
+        self.assertEqual(bytes(trama[10:]), bytes(7990))
+
+class PruebasPuertaDeVoz(unittest.TestCase):
+    @staticmethod
+    def _tono(amplitud, hz=220):
+        import numpy as np
+        from services.audio_sources import FRAME_SAMPLES, SAMPLE_RATE
+        t = np.arange(FRAME_SAMPLES) / SAMPLE_RATE
+        return (amplitud * np.sin(2 * np.pi * hz * t)).astype(np.int16).tobytes()
+
+    def test_abre_con_voz_y_cierra_tras_la_espera(self):
+        from services.vad import EnergyVAD
+        vad = EnergyVAD(hangover=3, preroll=2)
+        silencio, voz = self._tono(50), self._tono(4000)
+        for _ in range(10):
+            self.assertEqual(vad.process(silencio), [])
+        salida = vad.process(voz)
+        # Pre-roll (2 tramas de silencio) más la trama con voz
+        self.assertEqual(len(salida), 3)
+        self.assertTrue(vad.active)
+        self.assertEqual(vad.process(voz), [voz])
+        cerrada = [vad.process(silencio) and vad.closed_now for _ in range(3)]
+        self.assertEqual(cerrada, [False, False, True])
+        self.assertFalse(vad.active)
+        self.assertEqual(vad.process(silencio), [])
+
+    def test_silencio_y_siseo_no_abren(self):
+        import numpy as np
+        from services.audio_sources import FRAME_SAMPLES
+        from services.vad import EnergyVAD
+        vad = EnergyVAD()
+        ruido = np.random.default_rng(0).normal(0, 300, FRAME_SAMPLES).astype(np.int16).tobytes()
+        for trama in [bytes(FRAME_SAMPLES * 2)] * 5 + [ruido] * 50:
+            self.assertEqual(vad.process(trama), [])
+        self.assertEqual(vad.forwarded_ratio, 0.0)
+
+class PruebasIndiceArchivos(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix="lesi_idx_")
+        self.addCleanup(shutil.rmtree, self.dir, True)
+
+    def _crear(self, *partes):
+        ruta = os.path.join(self.dir, *partes)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        open(ruta, "w").close()
+        return ruta
+
+    def test_busqueda_fallida_reescanea(self):
+        import modules.os_control.file_index as fidx
+        informe = self._crear("informe anual.pdf")
+        indice = fidx.FileIndex([self.dir], index_path=None)
+        self.assertEqual(indice.search("informe"), informe)
+        acta = self._crear("sub", "acta.docx")
+        with mock.patch.object(fidx, "REFRESH_INTERVAL", 0):
+            self.assertEqual(indice.search("acta"), acta)
+
+class PruebasCacheFrases(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix="lesi_prompts_")
+        self.addCleanup(shutil.rmtree, self.dir, True)
+
+    def test_lru_en_memoria(self):
+        from services.prompt_cache import PromptCache
+        cache = PromptCache(max_bytes=30)
+        cache.put(("a", "voz", 180), b"x" * 10)
+        cache.put(("b", "voz", 180), b"x" * 10)
+        cache.put(("c", "voz", 180), b"x" * 10)
+        cache.get(("a", "voz", 180))
+        cache.put(("d", "voz", 180), b"x" * 10)
+        self.assertIsNotNone(cache.get(("a", "voz", 180)))
+        self.assertIsNone(cache.get(("b", "voz", 180)))
+        self.assertEqual(cache.size_bytes, 30)
+
+    def test_invalidar_conserva_la_voz_actual(self):
+        from services.prompt_cache import PromptCache
+        cache = PromptCache(cache_dir=self.dir)
+        cache.put(("Dime.", "voz1", 180), b"uno")
+        cache.put(("Dime.", "voz2", 180), b"dos")
+        cache.invalidate(keep=("voz2", 180))
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.get(("Dime.", "voz2", 180)), b"dos")
+        # El audio de la otra voz sigue en disco y vuelve a servir
+        self.assertEqual(cache.get(("Dime.", "voz1", 180)), b"uno")
+
+    def test_tope_en_disco(self):
+        from services.prompt_cache import PromptCache
+        cache = PromptCache(cache_dir=self.dir, max_disk_bytes=25)
+        cache.put(("a", "voz", 180), b"x" * 10)
+        os.utime(cache._disk_path(("a", "voz", 180)), (1, 1))
+        cache.put(("b", "voz", 180), b"x" * 10)
+        cache.put(("c", "voz", 180), b"x" * 10)
+        self.assertFalse(os.path.exists(cache._disk_path(("a", "voz", 180))))
+        self.assertTrue(os.path.exists(cache._disk_path(("c", "voz", 180))))
+
+MODULO_TRABAJADOR = """
+import os
+import time
+
+def execute_module(cmd, deps):
+    accion = cmd["comando"]
+    if accion == "dormir": time.sleep(30)
+    elif accion == "caer": os._exit(3)
+    elif accion == "esperar_cancelacion":
+        deps["cancel"].wait(30)
+        return "cancelada"
+    elif accion == "ignorar_cancelacion": time.sleep(30)
+    return accion
+"""
+
+class PruebasTrabajadores(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # El hijo (spawn) hereda sys.path, así que encuentra el módulo de prueba
+        cls.dir = tempfile.mkdtemp(prefix="lesi_trabajador_")
+        with open(os.path.join(cls.dir, "modulo_prueba.py"), "w", encoding="utf-8") as f:
+            f.write(MODULO_TRABAJADOR)
+        sys.path.insert(0, cls.dir)
+
+    @classmethod
+    def tearDownClass(cls):
+        sys.path.remove(cls.dir)
+        shutil.rmtree(cls.dir, ignore_errors=True)
+
+    def setUp(self):
+        from services.workers import WorkerProcess
+        self.trabajador = WorkerProcess("modulo_prueba")
+        self.addCleanup(self.trabajador.stop)
+
+    def _run(self, accion, timeout=30, cancel=None):
+        return self.trabajador.run("intent", {"comando": accion}, timeout, cancel)
+
+    def test_limite_de_tiempo_reinicia(self):
+        from services.workers import WorkerTimeout
+        self.assertEqual(self._run("eco"), "eco")
+        pid = self.trabajador.process.pid
+        with self.assertRaises(WorkerTimeout):
+            self._run("dormir", timeout=1)
+        self.assertEqual(self.trabajador.restarts, 1)
+        self.assertNotEqual(self.trabajador.process.pid, pid)
+        self.assertEqual(self._run("eco"), "eco")
+
+    def test_caida_reinicia(self):
+        from services.workers import WorkerCrashed
+        with self.assertRaises(WorkerCrashed):
+            self._run("caer")
+        self.assertEqual(self.trabajador.restarts, 1)
+        self.assertEqual(self._run("eco"), "eco")
+
+    def test_cancelacion_atendida(self):
+        cancel = threading.Event()
+        threading.Timer(0.5, cancel.set).start()
+        self.assertEqual(self._run("esperar_cancelacion", cancel=cancel), "cancelada")
+        self.assertEqual(self.trabajador.restarts, 0)
+
+    def test_cancelacion_ignorada_mata_el_proceso(self):
+        import services.workers as workers
+        cancel = threading.Event()
+        threading.Timer(0.5, cancel.set).start()
+        with mock.patch.object(workers, "CANCEL_GRACE_S", 0.5):
+            self.assertIsNone(self._run("ignorar_cancelacion", cancel=cancel))
+        self.assertEqual(self.trabajador.restarts, 1)
+
+    def test_el_pool_avisa_del_limite(self):
+        import services.workers as workers
+        pool = workers.WorkerPool()
+        self.addCleanup(pool.shutdown)
+        avisos = []
+        with mock.patch.dict(workers.WORKER_TIMEOUTS, {"dormir": 1}):
+            pool.dispatch("modulo_prueba", {"comando": "dormir"}, {"tts": avisos.append})
+        self.assertEqual(avisos, ["La acción tardó demasiado. La he cancelado."])
+
+class PruebasInterrupcion(unittest.TestCase):
+    def test_frase_de_parada(self):
+        from main import is_stop_command
+        for texto in ("detener lectura", "detener la lectura", "para la lectura", "detén la lectura", "ya basta"):
+            self.assertTrue(is_stop_command(texto), texto)
+
+    def test_avisos_de_lesi_no_interrumpen(self):
+        from main import is_stop_command
+        for texto in ("leyendo informe diga detener lectura o presione control para parar",
+                      "iniciando lectura diga detener lectura o presione control para parar",
+                      "para la lectura de este informe"):
+            self.assertFalse(is_stop_command(texto), texto)
+
+    def test_parcial_solo_con_verbos_inequivocos(self):
+        from main import is_stop_command
+        self.assertTrue(is_stop_command("detener lectura", partial=True))
+        # Podría ser el comienzo del eco de la lectura
+        self.assertFalse(is_stop_command("para la lectura", partial=True))
+
+    def test_microfono_abierto_solo_con_contenido(self):
+        import main
+        from services.tts import SpeechService, SpeechHandle, NullBackend, PRIORITY_NORMAL, PRIORITY_LOW
+        self.addCleanup(setattr, main, "speech_service", main.speech_service)
+        main.speech_service = SpeechService(backend_factory=NullBackend)
+        pipeline = main.VoicePipeline(arranque=None)
+        pipeline.busy.set()
+        main.speech_service._current = SpeechHandle("Leyendo informe. Diga detener lectura.", PRIORITY_NORMAL)
+        self.assertTrue(pipeline._muted())
+        main.speech_service._current = SpeechHandle("Fragmento del documento.", PRIORITY_LOW)
+        self.assertFalse(pipeline._muted())
+        pipeline.busy.clear()
+        self.assertTrue(pipeline._muted())
+
+if __name__ == "__main__":
+    unittest.main()